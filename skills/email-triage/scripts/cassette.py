@@ -0,0 +1,97 @@
+"""Record/replay of gog and Ollama traffic for offline triage runs.
+
+`--record DIR` runs a scan normally but also writes every `run_gog` result
+and every Ollama reply to DIR, keyed by the request (gog argv, or model +
+prompt + options). `--replay DIR` answers the same requests from DIR
+without the gog binary or a model, so a recorded day of mail can be
+re-triaged in seconds after tuning the rules, or used to benchmark the
+scan loop, state store and classifier cascade against real traffic.
+
+Layout: one JSON file per kind (`gog.json`, `ollama.json`) mapping a
+request hash to {"request": ..., "responses": [...]}. Recording into an
+existing directory appends, so several cron runs build one cassette. A
+request recorded more than once replays its responses in order, then
+repeats the last one.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class CassetteMiss(Exception):
+    """Replay found no recorded response for a request."""
+
+
+class Cassette:
+    """A directory of recorded responses, in record or replay mode."""
+
+    def __init__(self, directory: Path, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.directory = Path(directory).expanduser()
+        self.mode = mode
+        if mode == "replay" and not self.directory.is_dir():
+            raise FileNotFoundError(f"Cassette not found: {self.directory}")
+        self._tapes: dict[str, dict] = {}
+        self._positions: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def _tape(self, kind: str) -> dict:
+        # Callers hold the lock.
+        if kind not in self._tapes:
+            try:
+                self._tapes[kind] = json.loads((self.directory / f"{kind}.json").read_text())
+            except FileNotFoundError:
+                self._tapes[kind] = {}
+        return self._tapes[kind]
+
+    def call(self, kind: str, request, perform):
+        """Return the response to `request`: recorded, or from `perform()`.
+
+        In record mode `perform` runs and its result is stored (exceptions
+        pass through unrecorded). In replay mode `perform` never runs.
+        """
+        key = hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()[:16]
+        if self.mode == "replay":
+            with self._lock:
+                recorded = self._tape(kind).get(key)
+                if recorded is None:
+                    raise CassetteMiss(f"no recorded {kind} response for {json.dumps(request)[:200]}")
+                position = self._positions.get((kind, key), 0)
+                self._positions[(kind, key)] = position + 1
+                responses = recorded["responses"]
+                return responses[min(position, len(responses) - 1)]
+
+        response = perform()
+        with self._lock:
+            recorded = self._tape(kind).setdefault(key, {"request": request, "responses": []})
+            recorded["responses"].append(response)
+        return response
+
+    def save(self):
+        """Write recorded tapes to the cassette directory (record mode only)."""
+        if self.mode != "record":
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            for kind, tape in self._tapes.items():
+                path = self.directory / f"{kind}.json"
+                tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(tape, indent=1))
+                os.replace(tmp, path)
+
+
+_active: Cassette | None = None
+
+
+def use(cassette: Cassette | None):
+    """Route gog and Ollama calls in this process through `cassette`."""
+    global _active
+    _active = cassette
+
+
+def active() -> Cassette | None:
+    return _active
@@ -0,0 +1,110 @@
+"""IMAP transport for the triage scanner: COMPRESS=DEFLATE and pipelining.
+
+`imaplib.IMAP4_SSL` sends one command, waits for its tagged response, then
+sends the next, and never compresses the wire. Against a cross-region server
+the round trips and the raw text volume dominate scan time. `ImapConnection`
+keeps imaplib's parser but adds:
+
+  * COMPRESS=DEFLATE (RFC 4978), negotiated after login when the server
+    advertises it. Headers and text bodies typically shrink 3-5x.
+  * Tagged command pipelining: `fetch_pipelined` sends several FETCH
+    commands back to back and only then collects their responses, so the
+    bodies for many UIDs share round trips. imaplib already tracks every
+    outstanding tag, so responses are matched up as they arrive.
+"""
+
+import imaplib
+import zlib
+
+# imaplib validates command names against this table.
+imaplib.Commands.setdefault("COMPRESS", ("AUTH", "SELECTED"))
+
+_MAXLINE = imaplib._MAXLINE
+_RECV_SIZE = 65536
+
+
+class ImapConnection(imaplib.IMAP4_SSL):
+    """IMAP4_SSL with optional DEFLATE compression and pipelined FETCH."""
+
+    _compressor = None
+    _decompressor = None
+
+    # -- compression --------------------------------------------------------
+
+    def enable_compression(self) -> bool:
+        """Negotiate COMPRESS=DEFLATE if the server offers it. Call after login."""
+        if self._compressor is not None:
+            return True
+        # Servers often advertise more capabilities once authenticated.
+        typ, dat = self.capability()
+        if typ == "OK" and dat and dat[-1]:
+            self.capabilities = tuple(dat[-1].decode().upper().split())
+        if "COMPRESS=DEFLATE" not in self.capabilities:
+            return False
+        typ, _ = self._simple_command("COMPRESS", "DEFLATE")
+        if typ != "OK":
+            return False
+        # From here on both directions are raw DEFLATE streams (no zlib header).
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self._decompressor = zlib.decompressobj(-15)
+        self._rbuf = bytearray()
+        return True
+
+    @property
+    def compressed(self) -> bool:
+        return self._compressor is not None
+
+    def _fill(self) -> bool:
+        data = self.sock.recv(_RECV_SIZE)
+        if not data:
+            return False
+        self._rbuf += self._decompressor.decompress(data)
+        return True
+
+    def read(self, size):
+        if self._decompressor is None:
+            return super().read(size)
+        while len(self._rbuf) < size and self._fill():
+            pass
+        data = bytes(self._rbuf[:size])
+        del self._rbuf[:size]
+        return data
+
+    def readline(self):
+        if self._decompressor is None:
+            return super().readline()
+        while True:
+            end = self._rbuf.find(b"\n")
+            if end >= 0:
+                end += 1
+                break
+            if len(self._rbuf) > _MAXLINE:
+                raise self.error("got more than %d bytes" % _MAXLINE)
+            if not self._fill():
+                end = len(self._rbuf)
+                break
+        line = bytes(self._rbuf[:end])
+        del self._rbuf[:end]
+        return line
+
+    def send(self, data):
+        if self._compressor is None:
+            return super().send(data)
+        self.sock.sendall(self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    # -- pipelining ---------------------------------------------------------
+
+    def fetch_pipelined(self, msg_sets: list[bytes], message_parts: str) -> list:
+        """Send one FETCH per message set without waiting, then collect them all.
+
+        Returns the combined untagged FETCH data in imaplib's usual shape
+        (callers key it by sequence number, as with a single FETCH).
+        """
+        tags = [self._command("FETCH", msg_set, message_parts) for msg_set in msg_sets]
+        data = []
+        for tag in tags:
+            typ, dat = self._command_complete("FETCH", tag)
+            if typ != "OK":
+                raise self.error(f"FETCH failed: {dat}")
+            data.extend(self.untagged_responses.pop("FETCH", []))
+        return data
@@ -0,0 +1,155 @@
+"""Persistent scalable Bloom filter of every email key ever triaged.
+
+The JSON state file is pruned to the newest few hundred entries, so it cannot
+answer "have we classified this before?" for old unread mail. The seen-set
+can: it remembers every key forever in a few hundred KB, at the cost of a
+small, bounded false-positive rate (a brand-new email is occasionally treated
+as already seen).
+
+Layout follows Almeida et al., "Scalable Bloom Filters": a list of plain
+Bloom filters, each with double the capacity and half the error rate of the
+previous one, so the compound error rate stays below ``error_rate`` no matter
+how many keys are added.
+"""
+
+import hashlib
+import math
+import os
+import struct
+from pathlib import Path
+
+_MAGIC = b"SBF1"
+_HEADER = struct.Struct("<4sIdd")          # magic, initial capacity, error rate, tightening
+_STAGE = struct.Struct("<IIIId")           # capacity, count, hashes, bits, error rate
+
+DEFAULT_CAPACITY = 10_000
+DEFAULT_ERROR_RATE = 0.001
+GROWTH = 2
+TIGHTENING = 0.5
+
+
+class _Stage:
+    """One fixed-size Bloom filter."""
+
+    def __init__(self, capacity: int, error_rate: float, count: int = 0,
+                 num_hashes: int = 0, num_bits: int = 0, bits: bytearray | None = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        if not num_bits:
+            num_bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+            num_bits = (num_bits + 7) // 8 * 8
+        if not num_hashes:
+            num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.count = count
+        self.bits = bits if bits is not None else bytearray(num_bits // 8)
+
+    def _positions(self, h1: int, h2: int):
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def contains(self, h1: int, h2: int) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(h1, h2))
+
+    def add(self, h1: int, h2: int):
+        bits = self.bits
+        for p in self._positions(h1, h2):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+
+def _hash(key: str) -> tuple[int, int]:
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return h1, h2
+
+
+class SeenSet:
+    """Scalable Bloom filter keyed by triage email keys."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE):
+        self.initial_capacity = capacity
+        self.error_rate = error_rate
+        self.stages: list[_Stage] = []
+
+    def __len__(self) -> int:
+        return sum(stage.count for stage in self.stages)
+
+    def __contains__(self, key: str) -> bool:
+        h1, h2 = _hash(key)
+        return any(stage.contains(h1, h2) for stage in self.stages)
+
+    def add(self, key: str) -> bool:
+        """Add a key. Returns False if it was (probably) already present."""
+        h1, h2 = _hash(key)
+        if any(stage.contains(h1, h2) for stage in self.stages):
+            return False
+        if not self.stages or self.stages[-1].full:
+            n = len(self.stages)
+            self.stages.append(_Stage(
+                capacity=self.initial_capacity * GROWTH ** n,
+                # First stage gets error_rate * (1 - r) so the geometric series
+                # of all stages sums to at most error_rate.
+                error_rate=self.error_rate * (1 - TIGHTENING) * TIGHTENING ** n,
+            ))
+        self.stages[-1].add(h1, h2)
+        return True
+
+    def update(self, keys) -> int:
+        """Add many keys. Returns how many were new."""
+        return sum(1 for key in keys if self.add(key))
+
+    # -- persistence --------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        parts = [_HEADER.pack(_MAGIC, self.initial_capacity, self.error_rate, TIGHTENING)]
+        for stage in self.stages:
+            parts.append(_STAGE.pack(stage.capacity, stage.count, stage.num_hashes,
+                                     stage.num_bits, stage.error_rate))
+            parts.append(bytes(stage.bits))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SeenSet":
+        magic, capacity, error_rate, _ = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise ValueError("not a seen-set file")
+        seen = cls(capacity, error_rate)
+        offset = _HEADER.size
+        while offset < len(data):
+            cap, count, k, m, err = _STAGE.unpack_from(data, offset)
+            offset += _STAGE.size
+            bits = bytearray(data[offset:offset + m // 8])
+            if len(bits) != m // 8:
+                raise ValueError("truncated seen-set file")
+            offset += m // 8
+            seen.stages.append(_Stage(cap, err, count, k, m, bits))
+        return seen
+
+
+def seen_path_for(state_file: Path) -> Path:
+    """Seen-set lives next to the JSON state file."""
+    return state_file.with_suffix(".seen")
+
+
+def load(path: Path) -> SeenSet:
+    """Load a seen-set from disk, or return an empty one."""
+    try:
+        return SeenSet.from_bytes(path.read_bytes())
+    except (OSError, ValueError, struct.error):
+        return SeenSet()
+
+
+def save(seen: SeenSet, path: Path):
+    """Atomically write a seen-set to disk."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(seen.to_bytes())
+    os.replace(tmp, path)
@@ -0,0 +1,490 @@
+"""Gmail source for the triage engine, via the gog (Google OAuth) CLI.
+
+Configuration (environment variables):
+  GOG_ACCOUNT           Default Gmail account (or pass gog:ACCOUNT / --account)
+  GOG_KEYRING_PASSWORD  Keyring password for gog (required by gog itself)
+  GOG_LABEL_CATEGORIES  Gmail label -> triage category table, as comma-separated
+                        LABEL=category pairs checked in order (default below;
+                        empty disables). Mail labelled IMPORTANT always goes to
+                        the classifier.
+  GOG_FETCH_LABELS      Set to 1 to fetch each untriaged message's labels with
+                        `gmail messages get` when the search output has none
+                        (one extra gog call per message; off by default).
+"""
+
+import base64
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cassette
+import triage_state
+from triage_engine import Message, Source, SourceError, make_email_key, now_iso
+
+GOG_PATH = os.path.expanduser("~/google-cloud-sdk/bin/gog")
+GOG_TIMEOUT = 60
+# Search pages (of MAX_EMAILS_PER_SCAN results) walked per scan while
+# draining an unread backlog.
+MAX_PAGES_PER_SCAN = 10
+GOG_LABEL_CATEGORIES = os.environ.get(
+    "GOG_LABEL_CATEGORIES",
+    "SPAM=spam,CATEGORY_PROMOTIONS=spam,CATEGORY_SOCIAL=informational,"
+    "CATEGORY_UPDATES=informational,CATEGORY_FORUMS=informational",
+)
+GOG_FETCH_LABELS = os.environ.get("GOG_FETCH_LABELS", "") == "1"
+
+
+# ---------------------------------------------------------------------------
+# gog CLI wrapper
+# ---------------------------------------------------------------------------
+
+def _parse_output(returncode: int, stdout: str, stderr: str) -> dict | list | None:
+    if returncode != 0:
+        print(f"gog error: {stderr}", file=sys.stderr)
+        return None
+    try:
+        return json.loads(stdout) if stdout.strip() else None
+    except json.JSONDecodeError:
+        # Some commands don't return JSON
+        return stdout if stdout else None
+
+
+class GogSession:
+    """Runs gog commands for the lifetime of a scan.
+
+    The session builds gog's environment once and tracks the subprocesses
+    it starts, so `cancel` can kill every call still in flight.
+    """
+
+    def __init__(self):
+        self.env = os.environ.copy()
+        self.env["PATH"] = os.path.expanduser("~/google-cloud-sdk/bin") + ":" + self.env.get("PATH", "")
+        self._children: set[subprocess.Popen] = set()
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def run(self, args: list[str], account: str = None) -> dict | list | None:
+        """Run a gog command and return parsed JSON output."""
+        argv = list(args)
+        if account:
+            argv.extend(["--account", account])
+        argv.append("--json")
+
+        tape = cassette.active()
+        if tape is not None:
+            try:
+                return tape.call("gog", argv, lambda: self._run(argv))
+            except cassette.CassetteMiss as exc:
+                print(f"gog: {exc}", file=sys.stderr)
+                return None
+        return self._run(argv)
+
+    def _run(self, argv: list[str]) -> dict | list | None:
+        if self._cancelled:
+            return None
+        proc = subprocess.Popen(
+            [GOG_PATH] + argv,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=self.env,
+        )
+        with self._lock:
+            self._children.add(proc)
+            if self._cancelled:
+                # cancel() ran between the check above and Popen.
+                proc.kill()
+        try:
+            stdout, stderr = proc.communicate(timeout=GOG_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            print("gog command timed out", file=sys.stderr)
+            return None
+        finally:
+            with self._lock:
+                self._children.discard(proc)
+        if self._cancelled:
+            return None
+        return _parse_output(proc.returncode, stdout, stderr)
+
+    def cancel(self):
+        """Kill running gog subprocesses and refuse new ones."""
+        with self._lock:
+            self._cancelled = True
+            children = list(self._children)
+        for proc in children:
+            proc.kill()
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def default_session() -> GogSession:
+    """The session for gog calls made outside a source (one per process)."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = GogSession()
+        return _default_session
+
+
+def run_gog(args: list[str], account: str = None,
+            session: GogSession | None = None) -> dict | list | None:
+    """Run a gog command on `session` (default: the process-wide one)."""
+    return (session or default_session()).run(args, account)
+
+
+def search_unread_page(account: str, max_results: int = 20, page_token: str | None = None,
+                       session: GogSession | None = None) -> tuple[list[dict], str | None, int]:
+    """One page of `is:unread in:inbox` search results.
+
+    Returns (messages, next page token or None, estimated total unread).
+    """
+    args = [
+        "gmail", "messages", "search",
+        "is:unread in:inbox",
+        "--max", str(max_results)
+    ]
+    if page_token:
+        args.extend(["--page", page_token])
+    result = run_gog(args, account, session)
+
+    if not result:
+        return [], None, 0
+
+    # gog returns {"messages": [...], "nextPageToken": ...} or just a list
+    if isinstance(result, dict) and "messages" in result:
+        messages = result["messages"] or []
+        estimate = result.get("resultSizeEstimate")
+        return messages, result.get("nextPageToken") or None, int(estimate or len(messages))
+    elif isinstance(result, list):
+        return result, None, len(result)
+
+    return [], None, 0
+
+
+def get_unread_emails(account: str, max_results: int = 20) -> list[dict]:
+    """Fetch unread emails using gog gmail messages search."""
+    return search_unread_page(account, max_results)[0]
+
+
+def get_email_details(account: str, message_id: str,
+                      session: GogSession | None = None) -> dict | None:
+    """Get full email details by message ID."""
+    result = run_gog([
+        "gmail", "messages", "get",
+        message_id
+    ], account, session)
+    return result
+
+
+def message_body(details: dict, max_bytes: int) -> str:
+    """Plain-text body of a `gmail messages get` result, capped at max_bytes.
+
+    Accepts gog's flattened {"body": ...} as well as the Gmail API resource
+    (base64url `payload.parts[].body.data`).
+    """
+    text = details.get("body") if isinstance(details.get("body"), str) else ""
+    if not text:
+        parts = [details.get("payload") or {}]
+        while parts and not text:
+            part = parts.pop(0)
+            parts.extend(part.get("parts") or [])
+            data = (part.get("body") or {}).get("data")
+            if data and part.get("mimeType", "text/plain") == "text/plain":
+                text = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode("utf-8", "replace")
+    text = " ".join(text.split())
+    return text.encode()[:max_bytes].decode("utf-8", "ignore")
+
+
+def get_email_bodies(account: str, message_ids: list[str], max_bytes: int,
+                     session: GogSession | None = None) -> dict[str, str]:
+    """Full plain-text bodies for several messages, fetched concurrently.
+
+    gog has no batch get, so the per-message calls are issued together.
+    """
+    def fetch(message_id: str) -> str:
+        details = get_email_details(account, message_id, session)
+        return message_body(details, max_bytes) if isinstance(details, dict) else ""
+
+    with ThreadPoolExecutor(max_workers=min(8, len(message_ids) or 1)) as pool:
+        bodies = dict(zip(message_ids, pool.map(fetch, message_ids)))
+    return {mid: body for mid, body in bodies.items() if body}
+
+
+def get_history(account: str, start_history_id: str,
+                session: GogSession | None = None) -> dict | None:
+    """Summarise the mailbox changes since `start_history_id`.
+
+    Returns {"history_id", "new_unread", "read"}: the latest historyId, ids
+    of messages that arrived (or came back) unread in the inbox, and ids
+    that were marked read. Returns None when gog fails, which includes the
+    404 Gmail sends once a historyId is too old to replay.
+    """
+    result = run_gog([
+        "gmail", "history",
+        "--since", str(start_history_id)
+    ], account, session)
+    if not isinstance(result, dict) or not result.get("historyId"):
+        return None
+
+    unread: dict[str, bool] = {}  # message id -> unread in the inbox, last seen
+    for record in result.get("history") or []:
+        for item in record.get("messagesAdded") or []:
+            msg = item.get("message") or {}
+            labels = set(msg.get("labelIds") or [])
+            if msg.get("id"):
+                unread[msg["id"]] = {"UNREAD", "INBOX"} <= labels
+        for change in ("labelsAdded", "labelsRemoved"):
+            for item in record.get(change) or []:
+                msg = item.get("message") or {}
+                if not msg.get("id"):
+                    continue
+                # `message.labelIds` is the label set after this change.
+                labels = set(msg.get("labelIds") or [])
+                if "UNREAD" in (item.get("labelIds") or []) or "INBOX" in (item.get("labelIds") or []):
+                    unread[msg["id"]] = {"UNREAD", "INBOX"} <= labels
+        for item in record.get("messagesDeleted") or []:
+            unread.pop((item.get("message") or {}).get("id"), None)
+
+    return {
+        "history_id": str(result["historyId"]),
+        "new_unread": [mid for mid, is_unread in unread.items() if is_unread],
+        "read": [mid for mid, is_unread in unread.items() if not is_unread],
+    }
+
+
+def mailbox_history_id(account: str, session: GogSession | None = None) -> str | None:
+    """The mailbox's current historyId, independent of the unread search.
+
+    gog has no profile call, so this starts from the newest message in the
+    whole mailbox (any label, read or not) and asks `gmail history` for
+    everything since then, whose reply carries the latest historyId. An
+    empty unread inbox therefore still gets a cursor.
+    """
+    result = run_gog(["gmail", "messages", "search", "in:anywhere", "--max", "1"], account, session)
+    if isinstance(result, dict):
+        result = result.get("messages") or []
+    if not isinstance(result, list) or not result:
+        return None
+    newest = result[0]
+    seed = str(newest.get("historyId", ""))
+    if not seed.isdigit():
+        details = get_email_details(account, newest.get("id", ""), session)
+        seed = str(details.get("historyId", "")) if isinstance(details, dict) else ""
+    if not seed.isdigit():
+        return None
+    delta = get_history(account, seed, session)
+    return delta["history_id"] if delta is not None else seed
+
+
+def latest_history_id(account: str, emails: list[dict],
+                      session: GogSession | None = None) -> str | None:
+    """A historyId to resume from after a full search."""
+    ids = [int(e["historyId"]) for e in emails if str(e.get("historyId", "")).isdigit()]
+    return str(max(ids)) if ids else mailbox_history_id(account, session)
+
+
+def parse_label_categories(spec: str) -> dict[str, str]:
+    """Parse a GOG_LABEL_CATEGORIES table into {label: category}, in order."""
+    table = {}
+    for pair in spec.split(","):
+        label, _, category = pair.partition("=")
+        label, category = label.strip().upper(), category.strip()
+        if not label:
+            continue
+        if category not in triage_state.CATEGORIES:
+            raise SourceError(f"GOG_LABEL_CATEGORIES: unknown category '{category}' for {label}")
+        table[label] = category
+    return table
+
+
+def label_category(labels: list[str], table: dict[str, str]) -> tuple[str, str]:
+    """Category and reason implied by Gmail's labels, or ("", "") to classify."""
+    labels = {label.upper() for label in labels}
+    if "IMPORTANT" in labels:
+        return "", ""
+    for label, category in table.items():
+        if label in labels:
+            return category, f"[gmail] labelled {label}"
+    return "", ""
+
+
+# ---------------------------------------------------------------------------
+# Source
+# ---------------------------------------------------------------------------
+
+class GogSource(Source):
+    """Unread mail in a Gmail inbox, listed with `gog gmail messages search`.
+
+    The Gmail historyId reached by each scan is kept in the state as a
+    cursor. Later scans first ask `gog gmail history` for the changes since
+    then and only search when new unread mail arrived, so a quiet inbox
+    costs one small call. Messages marked read elsewhere are marked
+    surfaced. An expired or missing cursor falls back to a full search.
+
+    Older unread mail is reached through search page tokens, kept in the
+    cursor as a queue: each scan walks on from the page where the last one
+    stopped, at most MAX_PAGES_PER_SCAN pages and `limit` new messages per
+    scan, until the backlog is drained. When new mail arrives mid-walk, the
+    continuation of its first page goes to the front of the queue, so a
+    burst bigger than one page is finished before the older backlog; that
+    continuation is dropped once it reaches a page with nothing new.
+    """
+
+    name = "gog"
+
+    def __init__(self, account: str):
+        if not account:
+            raise SourceError("No account specified. Use gog:ACCOUNT, --account or set GOG_ACCOUNT")
+        self.account = account
+        self.label_categories = parse_label_categories(GOG_LABEL_CATEGORIES)
+        # Per source, so cancelling one account at the deadline leaves the
+        # others' calls alone.
+        self.session = GogSession()
+        self.history_id = None
+        self.page_tokens: list[str] = []
+        self.unread = 0
+        self.read_elsewhere: list[str] = []
+        # `messages get` results fetched for labels, reused for bodies.
+        self._details: dict[str, dict] = {}
+
+    def prepare(self, state):
+        cursor = state.get("cursors", {}).get(self.label, {})
+        self.history_id = cursor.get("history_id")
+        self.page_tokens = list(cursor.get("page_tokens") or [])
+        if cursor.get("page_token"):  # cursors written before the queue
+            self.page_tokens.append(cursor["page_token"])
+        self.unread = int(cursor.get("unread") or 0)
+        self.read_elsewhere = []
+        self._details = {}
+
+    def cancel(self):
+        self.session.cancel()
+
+    def fetch_bodies(self, messages, max_bytes):
+        bodies = {msg.id: message_body(self._details[msg.id], max_bytes)
+                  for msg in messages if msg.id in self._details}
+        missing = [msg.id for msg in messages if msg.id and msg.id not in bodies]
+        if missing:
+            bodies.update(get_email_bodies(self.account, missing, max_bytes, self.session))
+        return {msg.key: bodies[msg.id] for msg in messages if bodies.get(msg.id)}
+
+    def commit(self, state):
+        for key in self.read_elsewhere:
+            triage_state.surface_entry(state, key)
+        cursor = {"synced_at": now_iso(), "unread": self.unread}
+        if self.history_id:
+            cursor["history_id"] = self.history_id
+        if self.page_tokens:
+            cursor["page_tokens"] = self.page_tokens
+        state.setdefault("cursors", {})[self.label] = cursor
+
+    def fetch_unread(self, skip, limit):
+        inbox_changed = True
+        delta = get_history(self.account, self.history_id, self.session) if self.history_id else None
+        if delta is not None:
+            self.history_id = delta["history_id"]
+            self.read_elsewhere = delta["read"]
+            self.unread = max(0, self.unread + len(delta["new_unread"]) - len(delta["read"]))
+            # Membership only: history entries carry no subject to log.
+            inbox_changed = any(not skip(make_email_key(mid, "", "")) for mid in delta["new_unread"])
+        elif self.history_id:
+            print(f"{self.label}: history cursor expired; running a full search", file=sys.stderr)
+            self.history_id = None
+        if not inbox_changed and not self.page_tokens:
+            # Nothing to search; the count carried in the cursor stands.
+            return [], self.unread
+
+        # New mail first (page 1); a quiet inbox goes straight to the backlog.
+        token = None if inbox_changed else self.page_tokens[0]
+        emails, next_token, self.unread = search_unread_page(self.account, limit, token, self.session)
+        if self.history_id is None:
+            self.history_id = latest_history_id(self.account, emails, self.session)
+        return self._stream(skip, limit, token, emails, next_token), self.unread
+
+    def _stream(self, skip, limit, token, emails, next_token):
+        """Yield new messages page by page, moving `page_tokens` along.
+
+        `token` is the current page's token (None for the newest page); any
+        other token is the head of `page_tokens`. Pages are fetched lazily,
+        so the engine classifies one page while only that page is held in
+        memory.
+        """
+        new = 0
+        for page in itertools.count(1):
+            unseen = self._unseen(emails, skip)
+            for email_data, key in unseen:
+                if new >= limit:
+                    # The head token stays queued: this page is finished
+                    # next scan.
+                    return
+                new += 1
+                yield self._message(email_data, key)
+            self._advance(token, next_token, bool(unseen))
+            token = self.page_tokens[0] if self.page_tokens else None
+            if token is None or new >= limit or page >= MAX_PAGES_PER_SCAN:
+                return
+            emails, next_token, _ = search_unread_page(self.account, limit, token, self.session)
+
+    def _advance(self, token, next_token, had_new: bool):
+        """Update the token queue after finishing the page at `token`.
+
+        The newest page's continuation is queued in front of older walks.
+        A continuation that met a page with nothing new is dropped when an
+        older walk is queued behind it; the oldest walk runs to the end.
+        """
+        if token is None:
+            if next_token and (had_new or not self.page_tokens):
+                self.page_tokens.insert(0, next_token)
+        elif next_token and (had_new or len(self.page_tokens) == 1):
+            self.page_tokens[0] = next_token
+        else:
+            self.page_tokens.pop(0)
+
+    def _unseen(self, emails: list[dict], skip) -> list[tuple[dict, str]]:
+        """(email, key) for the page's untriaged emails, with their labels.
+
+        The label routing needs Gmail's labelIds. When the search result
+        leaves them out and GOG_FETCH_LABELS is set, the untriaged messages
+        are fetched with `gmail messages get`, which always includes them;
+        otherwise they go to the classifier.
+        """
+        unseen = []
+        for email_data in emails:
+            key = make_email_key(email_data.get("id", ""), email_data.get("subject", "(no subject)"),
+                                 email_data.get("from", ""))
+            if not skip(key, email_data.get("subject", "(no subject)")):
+                unseen.append((email_data, key))
+        unlabelled = [email_data for email_data, _ in unseen
+                      if GOG_FETCH_LABELS and email_data.get("id") and "labelIds" not in email_data and "labels" not in email_data]
+        if unlabelled:
+            with ThreadPoolExecutor(max_workers=min(8, len(unlabelled))) as pool:
+                details = pool.map(lambda e: get_email_details(self.account, e["id"], self.session), unlabelled)
+                for email_data, detail in zip(unlabelled, details):
+                    if isinstance(detail, dict):
+                        email_data["labelIds"] = detail.get("labelIds") or detail.get("labels") or []
+                        self._details[email_data["id"]] = detail
+        return unseen
+
+    def _message(self, email_data: dict, key: str) -> Message:
+        # Gmail's own categorisation is free; only unlabelled (Primary)
+        # and IMPORTANT mail needs the classifier.
+        labels = email_data.get("labelIds") or email_data.get("labels") or []
+        category, reason = label_category(labels, self.label_categories)
+        return Message(
+            key=key,
+            subject=email_data.get("subject", "(no subject)"),
+            sender=email_data.get("from", ""),
+            date=email_data.get("date", now_iso()),
+            preview=email_data.get("snippet", ""),
+            id=email_data.get("id", ""),
+            category=category,
+            reason=reason,
+        )
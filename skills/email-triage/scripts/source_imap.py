@@ -0,0 +1,312 @@
+"""IMAP source for the triage engine.
+
+Configuration (environment variables):
+  IMAP_HOST           IMAP server host (required)
+  IMAP_PORT           IMAP port (default: 993)
+  IMAP_USER           IMAP username/email (required)
+  IMAP_PASS           IMAP password (required)
+  IMAP_COMPRESS       Negotiate COMPRESS=DEFLATE when offered (default: 1)
+
+Server-side SEARCH filters (all optional), so irrelevant mail is discarded
+by the server before anything is transferred:
+  IMAP_FOLDERS            Comma-separated folders to scan (default: INBOX; "*" = all)
+  IMAP_EXCLUDE_FOLDERS    Folders skipped when IMAP_FOLDERS is "*" (Trash/Junk/Sent/
+                          Drafts/All special-use folders are always skipped)
+  IMAP_SINCE_DAYS         Only mail received in the last N days (SINCE)
+  IMAP_MAX_SIZE           Only messages smaller than N bytes (SMALLER)
+  IMAP_EXCLUDE_FROM       Comma-separated senders/domains to drop (NOT FROM)
+  IMAP_EXCLUDE_KEYWORDS   Comma-separated IMAP keywords/flags to drop (NOT KEYWORD),
+                          e.g. $Junk,$Phishing
+  IMAP_LEARN_SPAM_MIN     Also drop sender domains whose last N+ triaged emails were
+                          all spam (default: 3; 0 disables)
+"""
+
+import email
+import email.header
+import email.message
+import email.utils
+import imaplib
+import os
+import re
+import sys
+from datetime import date, timedelta, timezone
+
+import triage_state
+from imap_transport import ImapConnection
+from triage_engine import Message, Source, SourceError, make_email_key, now_iso
+
+IMAP_HOST = os.environ.get("IMAP_HOST", "")
+IMAP_PORT = int(os.environ.get("IMAP_PORT", "993"))
+IMAP_USER = os.environ.get("IMAP_USER", "")
+IMAP_PASS = os.environ.get("IMAP_PASS", "")
+IMAP_COMPRESS = os.environ.get("IMAP_COMPRESS", "1") not in ("0", "false", "no")
+
+
+def _env_list(name: str, default: str = "") -> list[str]:
+    return [item.strip() for item in os.environ.get(name, default).split(",") if item.strip()]
+
+
+IMAP_FOLDERS = _env_list("IMAP_FOLDERS", "INBOX")
+IMAP_EXCLUDE_FOLDERS = {f.lower() for f in _env_list("IMAP_EXCLUDE_FOLDERS")}
+IMAP_SINCE_DAYS = int(os.environ.get("IMAP_SINCE_DAYS", "0"))
+IMAP_MAX_SIZE = int(os.environ.get("IMAP_MAX_SIZE", "0"))
+IMAP_EXCLUDE_FROM = _env_list("IMAP_EXCLUDE_FROM")
+IMAP_EXCLUDE_KEYWORDS = _env_list("IMAP_EXCLUDE_KEYWORDS")
+IMAP_LEARN_SPAM_MIN = int(os.environ.get("IMAP_LEARN_SPAM_MIN", "3"))
+
+# Every NOT FROM lengthens the SEARCH command; keep it well under the
+# ~8 KB command-line limit common IMAP servers enforce.
+MAX_NOT_FROM = 50
+# Body FETCHes are pipelined in commands of this many messages each.
+PIPELINE_CHUNK = 5
+SKIPPED_SPECIAL_USE = {"\\trash", "\\junk", "\\sent", "\\drafts", "\\all", "\\noselect"}
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+_LIST_RE = re.compile(r'\((?P<flags>[^)]*)\) (?P<delim>"[^"]*"|NIL) (?P<name>.+)')
+
+
+def decode_header(raw: str) -> str:
+    """Decode a MIME-encoded email header."""
+    if not raw:
+        return ""
+    parts = email.header.decode_header(raw)
+    decoded = []
+    for part, charset in parts:
+        if isinstance(part, bytes):
+            decoded.append(part.decode(charset or "utf-8", errors="replace"))
+        else:
+            decoded.append(part)
+    return " ".join(decoded)
+
+
+def get_body_preview(msg: email.message.Message, max_chars: int = 500) -> str:
+    """Extract a plain-text preview from the email body."""
+    body = None
+    if msg.is_multipart():
+        for part in msg.walk():
+            if part.get_content_type() == "text/plain":
+                payload = part.get_payload(decode=True)
+                if payload:
+                    charset = part.get_content_charset() or "utf-8"
+                    body = payload.decode(charset, errors="replace")
+                    break
+    else:
+        if msg.get_content_type() == "text/plain":
+            payload = msg.get_payload(decode=True)
+            if payload:
+                charset = msg.get_content_charset() or "utf-8"
+                body = payload.decode(charset, errors="replace")
+
+    if not body:
+        return "(no plain-text body)"
+
+    preview = " ".join(body.split())
+    if len(preview) > max_chars:
+        preview = preview[:max_chars].rstrip() + "…"
+    return preview
+
+
+def parse_date(date_raw: str) -> str:
+    """Normalize a Date header to UTC ISO 8601 (now if missing or unparseable)."""
+    try:
+        date_parsed = email.utils.parsedate_to_datetime(date_raw) if date_raw else None
+    except (TypeError, ValueError):
+        date_parsed = None
+    if date_parsed is None:
+        return now_iso()
+    return date_parsed.astimezone(timezone.utc).isoformat()
+
+
+def message_from_email(msg: email.message.Message) -> Message:
+    """Build an engine Message from a parsed RFC 822 message."""
+    sender = decode_header(msg.get("From", ""))
+    subject = decode_header(msg.get("Subject", "(no subject)"))
+    return Message(
+        key=make_email_key(msg.get("Message-ID", ""), subject, sender),
+        subject=subject,
+        sender=sender,
+        date=parse_date(msg.get("Date", "")),
+        preview=get_body_preview(msg),
+        id=(msg.get("Message-ID") or "").strip(),
+    )
+
+
+def search_string(value: str) -> str | None:
+    """`value` as a quoted ASCII SEARCH string, or None if it can't be one.
+
+    imaplib sends commands as ASCII, so an internationalized domain is
+    IDNA-encoded; anything else non-ASCII is dropped rather than failing
+    the whole SEARCH.
+    """
+    value = value.strip().replace('"', "").replace("\\", "")
+    local, at, host = value.rpartition("@")
+    if host and not host.isascii():
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:
+            return None
+    value = f"{local}{at}{host}"
+    if not value or not value.isascii():
+        return None
+    return f'"{value}"'
+
+
+def build_search_criteria(exclude_from: list[str], learned_domains: list[str] = ()) -> list[str]:
+    """IMAP SEARCH keys for unread mail minus everything configured out.
+
+    FROM is a substring match on the header, so learned domains are
+    matched as "@domain" (a learned t.co must not drop company.com mail).
+    """
+    criteria = ["UNSEEN"]
+    if IMAP_SINCE_DAYS > 0:
+        since = date.today() - timedelta(days=IMAP_SINCE_DAYS)
+        # RFC 3501 date; month names must be English whatever the locale
+        criteria += ["SINCE", f"{since.day}-{_MONTHS[since.month - 1]}-{since.year}"]
+    if IMAP_MAX_SIZE > 0:
+        criteria += ["SMALLER", str(IMAP_MAX_SIZE)]
+    senders = list(exclude_from) + [f"@{domain}" for domain in learned_domains if domain not in exclude_from]
+    terms = [term for term in map(search_string, senders) if term]
+    # Configured excludes come first so learned domains are what gets capped.
+    for term in terms[:MAX_NOT_FROM]:
+        criteria += ["NOT", "FROM", term]
+    for keyword in IMAP_EXCLUDE_KEYWORDS:
+        if keyword.isascii():
+            criteria += ["NOT", "KEYWORD", keyword]
+    return criteria
+
+
+def list_folders(mail: imaplib.IMAP4) -> list[str]:
+    """Folders to scan: IMAP_FOLDERS, or every selectable folder for "*"."""
+    if IMAP_FOLDERS != ["*"]:
+        return IMAP_FOLDERS
+    status, data = mail.list()
+    if status != "OK":
+        return ["INBOX"]
+    folders = []
+    for line in data:
+        match = _LIST_RE.match(line.decode(errors="replace") if isinstance(line, bytes) else str(line))
+        if not match:
+            continue
+        flags = {flag.lower() for flag in match["flags"].split()}
+        name = match["name"].strip('"')
+        if flags & SKIPPED_SPECIAL_USE or name.lower() in IMAP_EXCLUDE_FOLDERS:
+            continue
+        folders.append(name)
+    return folders
+
+
+def parse_fetch_response(msg_data: list) -> dict[bytes, bytes]:
+    """Map message sequence numbers to payloads from a multi-message FETCH."""
+    payloads = {}
+    for item in msg_data:
+        if isinstance(item, tuple) and len(item) == 2:
+            payloads[item[0].split(None, 1)[0]] = item[1]
+    return payloads
+
+
+class ImapSource(Source):
+    """Unread mail in an IMAP INBOX."""
+
+    name = "imap"
+
+    def __init__(self):
+        missing = [name for name, value in (
+            ("IMAP_HOST", IMAP_HOST), ("IMAP_USER", IMAP_USER), ("IMAP_PASS", IMAP_PASS),
+        ) if not value]
+        if missing:
+            raise SourceError(f"Missing required environment variable(s): {', '.join(missing)}")
+        self.account = IMAP_USER
+        self.exclude_from = list(IMAP_EXCLUDE_FROM)
+        self.learned_domains: list[str] = []
+        self._mail = None
+
+    def prepare(self, state):
+        if IMAP_LEARN_SPAM_MIN > 0:
+            self.learned_domains = triage_state.spam_domains(state, IMAP_LEARN_SPAM_MIN)
+
+    def fetch_unread(self, skip, limit):
+        criteria = build_search_criteria(self.exclude_from, self.learned_domains)
+        mail = self._mail = ImapConnection(IMAP_HOST, IMAP_PORT)
+        try:
+            mail.login(IMAP_USER, IMAP_PASS)
+            if IMAP_COMPRESS:
+                mail.enable_compression()
+            messages = []
+            total_unread = 0
+            for folder in list_folders(mail):
+                status, _ = mail.select(f'"{folder}"', readonly=True)
+                if status != "OK":
+                    continue
+                status, data = self._search(mail, criteria)
+                if status != "OK" or not data[0]:
+                    continue
+                msg_ids = data[0].split()
+                total_unread += len(msg_ids)
+                remaining = limit - len(messages)
+                if remaining > 0:
+                    messages.extend(self._fetch_new(mail, list(reversed(msg_ids))[:remaining], skip))
+            return messages, total_unread
+        except imaplib.IMAP4.error as exc:
+            raise SourceError(f"IMAP error: {exc}") from exc
+        finally:
+            try:
+                mail.logout()
+            except (imaplib.IMAP4.error, OSError):
+                pass
+
+    def _search(self, mail: ImapConnection, criteria: list[str]):
+        try:
+            return mail.search(None, *criteria)
+        except imaplib.IMAP4.abort:
+            raise
+        except (imaplib.IMAP4.error, UnicodeError) as exc:
+            # A server that rejects one of the excludes must not cost the scan.
+            plain = build_search_criteria([])
+            if criteria == plain:
+                raise
+            print(f"IMAP SEARCH with excludes failed ({exc}); retrying without them", file=sys.stderr)
+            return mail.search(None, *plain)
+
+    def cancel(self):
+        mail = self._mail
+        if mail is not None:
+            try:
+                mail.shutdown()
+            except OSError:
+                pass
+
+    def _fetch_new(self, mail: ImapConnection, msg_ids: list[bytes], skip) -> list[Message]:
+        # Headers for the whole batch in one round trip, so seen mail is
+        # skipped before its body is downloaded or classified.
+        status, header_data = mail.fetch(
+            b",".join(msg_ids), "(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID SUBJECT FROM)])"
+        )
+        headers = parse_fetch_response(header_data) if status == "OK" else {}
+
+        wanted = []
+        for mid in msg_ids:
+            if mid in headers:
+                hdr = email.message_from_bytes(headers[mid])
+                subject = decode_header(hdr.get("Subject", "(no subject)"))
+                key = make_email_key(
+                    hdr.get("Message-ID", ""), subject, decode_header(hdr.get("From", ""))
+                )
+                if skip(key, subject):
+                    continue
+            wanted.append(mid)
+        if not wanted:
+            return []
+
+        # All remaining bodies in pipelined FETCHes: one round trip overall
+        # instead of one per message.
+        chunks = [b",".join(wanted[i:i + PIPELINE_CHUNK]) for i in range(0, len(wanted), PIPELINE_CHUNK)]
+        bodies = parse_fetch_response(mail.fetch_pipelined(chunks, "(BODY.PEEK[])"))
+
+        messages = []
+        for mid in wanted:
+            if mid not in bodies:
+                continue
+            msg = message_from_email(email.message_from_bytes(bodies[mid]))
+            if skip(msg.key, msg.subject):
+                continue
+            messages.append(msg)
+        return messages
@@ -0,0 +1,44 @@
+"""Local mbox source for the triage engine.
+
+Reads an mbox file (e.g. a Thunderbird/mutt spool or a Google Takeout
+export). A message counts as unread when its Status header lacks the R flag.
+"""
+
+import mailbox
+from pathlib import Path
+
+from source_imap import message_from_email
+from triage_engine import Source, SourceError
+
+
+class MboxSource(Source):
+    """Unread messages in a local mbox file."""
+
+    name = "mbox"
+
+    def __init__(self, path: str):
+        if not path:
+            raise SourceError("No mbox path specified. Use mbox:PATH")
+        self.path = Path(path).expanduser()
+        if not self.path.is_file():
+            raise SourceError(f"mbox not found: {self.path}")
+        self.account = str(self.path)
+
+    def fetch_unread(self, skip, limit):
+        box = mailbox.mbox(self.path, create=False)
+        try:
+            unread = [key for key, msg in box.iteritems() if "R" not in msg.get_flags()]
+            messages = []
+            # Newest last in an mbox, so walk backwards like the IMAP source.
+            # Already-triaged mail is passed over, so each scan reaches
+            # `limit` messages further into an unread backlog.
+            for key in reversed(unread):
+                if len(messages) >= limit:
+                    break
+                msg = message_from_email(box.get_message(key))
+                if skip(msg.key, msg.subject):
+                    continue
+                messages.append(msg)
+            return messages, len(unread)
+        finally:
+            box.close()
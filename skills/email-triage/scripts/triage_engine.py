@@ -0,0 +1,640 @@
+"""Triage engine shared by email-triage.py and gog-triage.py.
+
+One classifier pipeline and one state store, fed by pluggable sources:
+
+  imap           IMAP inbox configured by IMAP_HOST/IMAP_USER/IMAP_PASS (source_imap.py)
+  gog:ACCOUNT    Gmail via the gog CLI (source_gog.py)
+  mbox:PATH      Local mbox file (source_mbox.py)
+
+`--source` is repeatable, so one process can scan Gmail and IMAP accounts
+together; a bare `gog` spec expands to one source per `--account`. Sources
+run concurrently under a global deadline, share one Ollama connection and
+classification cache, and their results are merged into the state with a
+single locked commit.
+"""
+
+import argparse
+import hashlib
+import http.client
+import json
+import sys
+import threading
+from concurrent.futures import Future, wait
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import cassette
+import triage_server
+import triage_state
+
+MAX_EMAILS_PER_SCAN = 20
+MAX_STATE_ENTRIES = 500
+CLASSIFICATION_TIMEOUT = 30  # seconds per email
+SCAN_DEADLINE = 300  # seconds for a whole multi-source scan
+# Ollama classifications below this confidence get a second look at the
+# full body from sources that only hand over a snippet (see
+# Source.fetch_bodies). Heuristic results never do: their confidences are
+# fixed per rule, and without Ollama a body would not change much.
+LOW_CONFIDENCE = 0.6
+# Body text fetched for the second pass; also what the prompt gets of it.
+BODY_MAX_BYTES = 2000
+
+CATEGORY_ICONS = {"urgent": "🔴", "needs-response": "🟡", "informational": "🔵", "spam": "⚫"}
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+class SourceError(Exception):
+    """A source is misconfigured or its backend failed."""
+
+
+@dataclass
+class Message:
+    """An unread email as handed from a source to the classifier.
+
+    A source that already knows the category (e.g. from provider labels)
+    sets `category` and `reason`, and the classifier is skipped.
+    """
+
+    key: str
+    subject: str
+    sender: str
+    date: str
+    preview: str
+    id: str = ""
+    category: str = ""
+    reason: str = ""
+
+
+class Source:
+    """A mailbox the engine can scan.
+
+    Subclasses set `name` and `account` and implement `fetch_unread`.
+    """
+
+    name = "source"
+    account = ""
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}:{self.account}" if self.account else self.name
+
+    def prepare(self, state: dict):
+        """Look at the loaded state before fetching (e.g. to learn filters)."""
+
+    def commit(self, state: dict):
+        """Record per-source bookkeeping in the state being committed.
+
+        Called inside the scan's locked transaction, after new entries are
+        merged and only if `fetch_unread` succeeded.
+        """
+
+    def cancel(self):
+        """Abort in-flight I/O once the scan deadline has passed (best effort)."""
+
+    def fetch_bodies(self, messages: list[Message], max_bytes: int) -> dict[str, str]:
+        """Return {key: plain-text body} (at most `max_bytes` each) for messages
+        whose first classification was unsure.
+
+        Only sources whose previews are short snippets need this; the
+        default fetches nothing and the first classification stands.
+        """
+        return {}
+
+    def fetch_unread(self, skip, limit: int) -> tuple[Iterable[Message], int]:
+        """Return up to `limit` unread messages and the total unread count.
+
+        The messages may be a generator; it is consumed while classifying,
+        so a source can fetch page by page.
+
+        `skip(key, subject)` returns True for already-triaged mail; sources
+        should call it as early as possible so seen mail is never fetched in
+        full. Without `subject` (a bare membership test, e.g. on ids from a
+        history feed) nothing is logged.
+        """
+        raise NotImplementedError
+
+
+def make_source(spec: str, account: str = "") -> Source:
+    """Build a source from a CLI spec: imap, gog[:ACCOUNT] or mbox:PATH."""
+    kind, _, arg = spec.partition(":")
+    if kind == "imap":
+        from source_imap import ImapSource
+        return ImapSource()
+    if kind == "gog":
+        from source_gog import GogSource
+        return GogSource(arg or account)
+    if kind == "mbox":
+        from source_mbox import MboxSource
+        return MboxSource(arg)
+    raise SourceError(f"Unknown source '{spec}' (expected imap, gog:ACCOUNT or mbox:PATH)")
+
+
+def split_accounts(values: list[str]) -> list[str]:
+    """Flatten repeated and comma-separated account options, dropping duplicates."""
+    accounts = (a.strip() for value in values for a in (value or "").split(","))
+    return list(dict.fromkeys(a for a in accounts if a))
+
+
+def make_email_key(msg_id: str, subject: str, sender: str) -> str:
+    """Create a stable key for deduplication. Prefers the message id, falls back to hash."""
+    if msg_id:
+        return msg_id.strip().strip("<>")
+    combo = f"{subject}|{sender}"
+    return hashlib.sha256(combo.encode()).hexdigest()[:16]
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ---------------------------------------------------------------------------
+# Classification
+# ---------------------------------------------------------------------------
+
+PROMPT = """Classify this email into exactly one category. Reply with ONLY a JSON object, no other text.
+
+Categories:
+- "urgent": Server outages, security alerts, legal notices, payment failures, time-critical action needed
+- "needs-response": Business inquiries, questions requiring answers, partnership proposals, support requests from real people
+- "informational": Billing statements, receipts, confirmations, newsletters, status updates, automated notifications
+- "spam": Marketing, promotions, unsolicited sales, irrelevant mass emails
+
+Email:
+From: {sender}
+Subject: {subject}
+{text_label}: {preview}
+
+Reply format: {{"category": "<category>", "reason": "<brief reason>", "confidence": <0.0-1.0>}}"""
+
+URGENT_KEYWORDS = [
+    "outage", "down", "critical", "security alert", "breach",
+    "suspended", "terminated", "legal notice", "court",
+    "payment failed", "overdue", "final notice", "action required",
+    "account locked", "verify your", "unusual activity",
+]
+SPAM_PATTERNS = [
+    "unsubscribe", "opt out", "special offer", "limited time",
+    "click here", "act now", "congratulations", "you've won",
+    "free trial", "exclusive deal", "% off", "sale ends",
+    "order now", "buy now", "discount code",
+]
+SPAM_SENDERS = ["noreply@", "marketing@", "promo@", "newsletter@", "deals@", "offers@"]
+INFO_PATTERNS = [
+    "receipt", "confirmation", "your order", "shipping",
+    "has shipped", "delivered", "tracking", "invoice",
+    "statement", "notification", "alert", "automated",
+    "newsletter", "weekly digest", "monthly report",
+    "do not reply", "noreply", "no-reply",
+]
+INFO_SENDERS = ["no-reply", "noreply", "notifications@", "alerts@", "billing@"]
+RESPONSE_PATTERNS = [
+    "question", "inquiry", "proposal", "partnership",
+    "following up", "request", "can you", "would you", "could you",
+    "please review", "feedback", "meeting", "schedule",
+    "let me know", "get back to", "your thoughts",
+]
+
+
+def classify_heuristic(sender: str, subject: str, preview: str) -> tuple[str, str, float]:
+    """Rule-based fallback classification when Ollama is unavailable.
+
+    Returns (category, reason, confidence); a keyword match counts as
+    reasonably confident, the default as a guess.
+    """
+    sender_lower = sender.lower()
+    combined = f"{subject.lower()} {preview.lower()}"
+
+    if any(kw in combined for kw in URGENT_KEYWORDS):
+        return "urgent", "[heuristic] Matched urgent keywords", 0.7
+    if any(p in combined for p in SPAM_PATTERNS) or any(s in sender_lower for s in SPAM_SENDERS):
+        return "spam", "[heuristic] Marketing/promotional pattern", 0.7
+    if any(p in combined for p in INFO_PATTERNS) or any(s in sender_lower for s in INFO_SENDERS):
+        return "informational", "[heuristic] Automated notification pattern", 0.7
+    if any(p in combined for p in RESPONSE_PATTERNS):
+        return "needs-response", "[heuristic] Appears to need a reply", 0.6
+    return "informational", "[heuristic] Default classification", 0.3
+
+
+class OllamaClient:
+    """Keep-alive connection to Ollama shared by every source in a run.
+
+    Requests are serialized (Ollama runs one generation per model at a time
+    anyway). A refused connection marks Ollama down for the rest of the run,
+    so the remaining emails go straight to the heuristics instead of each
+    paying a connect attempt.
+    """
+
+    def __init__(self, url: str, model: str, timeout: float = CLASSIFICATION_TIMEOUT):
+        parts = urlsplit(url)
+        self._conn_class = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        )
+        self._netloc = parts.netloc
+        self._base = parts.path.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.available = True
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _post(self, path: str, body: bytes) -> bytes:
+        if self._conn is None:
+            self._conn = self._conn_class(self._netloc, timeout=self.timeout)
+        self._conn.request("POST", self._base + path, body=body,
+                           headers={"Content-Type": "application/json"})
+        resp = self._conn.getresponse()
+        data = resp.read()
+        if resp.status != 200:
+            raise http.client.HTTPException(f"Ollama returned HTTP {resp.status}")
+        return data
+
+    def generate(self, prompt: str, options: dict) -> str:
+        tape = cassette.active()
+        if tape is not None:
+            request = {"model": self.model, "prompt": prompt, "options": options}
+            try:
+                return tape.call("ollama", request, lambda: self._generate(prompt, options))
+            except cassette.CassetteMiss as exc:
+                raise ConnectionError(str(exc)) from exc
+        return self._generate(prompt, options)
+
+    def _generate(self, prompt: str, options: dict) -> str:
+        body = json.dumps({
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "options": options,
+        }).encode()
+        with self._lock:
+            if not self.available:
+                raise ConnectionError("Ollama unavailable")
+            for attempt in (1, 2):
+                try:
+                    return json.loads(self._post("/api/generate", body)).get("response", "")
+                except ConnectionRefusedError:
+                    self._close()
+                    self.available = False
+                    raise
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    # Server dropped the idle keep-alive connection; retry once.
+                    self._close()
+                    if attempt == 2:
+                        raise
+                except Exception:
+                    self._close()
+                    raise
+
+
+def parse_llm_reply(response_text: str) -> tuple[str, str, float]:
+    """Parse the model's JSON reply (tolerating markdown fences).
+
+    Models that leave out `confidence` are trusted (0.8).
+    """
+    response_text = response_text.strip()
+    if "```" in response_text:
+        response_text = response_text.split("```")[1]
+        if response_text.startswith("json"):
+            response_text = response_text[4:]
+        response_text = response_text.strip()
+
+    parsed = json.loads(response_text)
+    category = parsed.get("category", "informational").lower()
+    reason = parsed.get("reason", "LLM classification")
+    try:
+        confidence = min(max(float(parsed.get("confidence", 0.8)), 0.0), 1.0)
+    except (TypeError, ValueError):
+        confidence = 0.8
+    if category not in triage_state.CATEGORIES:
+        category, confidence = "informational", 0.0
+    return category, reason, confidence
+
+
+class Classifier:
+    """Ollama classification with heuristic fallback and a per-run cache.
+
+    The cache catches the same email arriving through two sources (e.g. a
+    message sent to both the Gmail and the IMAP account).
+    """
+
+    def __init__(self, ollama: OllamaClient | None):
+        self.ollama = ollama
+        self._cache: dict[str, tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+
+    def classify(self, sender: str, subject: str, preview: str,
+                 body: str = "") -> tuple[str, str, float]:
+        """Return (category, reason, confidence).
+
+        With `body`, the full text is classified instead of the preview
+        (the second pass for unsure snippets).
+        """
+        text, limit = (body, BODY_MAX_BYTES) if body else (preview, 300)
+        cache_key = hashlib.sha256(f"{sender}\0{subject}\0{text[:limit]}".encode()).hexdigest()
+        with self._lock:
+            if cache_key in self._cache:
+                return self._cache[cache_key]
+        result = self._classify(sender, subject, text[:limit], "Body" if body else "Preview")
+        with self._lock:
+            self._cache[cache_key] = result
+        return result
+
+    def _classify(self, sender: str, subject: str, text: str, text_label: str) -> tuple[str, str, float]:
+        if self.ollama is None:
+            return classify_heuristic(sender, subject, text)
+        prompt = PROMPT.format(sender=sender, subject=subject, text_label=text_label, preview=text)
+        try:
+            reply = self.ollama.generate(prompt, {"temperature": 0.1, "num_predict": 100})
+            category, reason, confidence = parse_llm_reply(reply)
+            return category, f"[ollama] {reason}", confidence
+        except Exception:
+            # Ollama unavailable or returned garbage — fall back to heuristics
+            return classify_heuristic(sender, subject, text)
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+
+def _start_daemon(fn, *args) -> Future:
+    """Run fn(*args) on a daemon thread; the returned future gets its result."""
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def scan(sources: list[Source], state_file: Path, classifier: Classifier,
+         dry_run: bool = False, verbose: bool = False,
+         deadline: float | None = SCAN_DEADLINE) -> list[dict]:
+    """Scan all sources concurrently and commit new classifications once.
+
+    A source that fails, or is still running when `deadline` seconds have
+    passed, is reported as an error and contributes nothing; the others are
+    committed as usual.
+    """
+    state = triage_state.load_state(state_file)
+    seen = triage_state.load_seen(state_file)
+    print_lock = threading.Lock()
+    expired = threading.Event()
+
+    def say(*lines: str):
+        if verbose:
+            with print_lock:
+                for line in lines:
+                    print(line)
+
+    def scan_source(source: Source) -> tuple[dict, dict]:
+        def skip(key: str, subject: str = "") -> bool:
+            if key in state["emails"] or key in seen:
+                if subject:
+                    say(f"  [skip] {subject[:60]} (already triaged)")
+                return True
+            return False
+
+        result = {"source": source.label, "account": source.account, "new": 0, "total_unread": 0}
+        say(f"Scanning {source.label}...")
+        try:
+            source.prepare(state)
+            messages, total_unread = source.fetch_unread(skip, MAX_EMAILS_PER_SCAN)
+        except Exception as exc:
+            print(f"ERROR: {source.label}: {exc}", file=sys.stderr)
+            result["error"] = str(exc)
+            return result, {}
+
+        classified = []
+        try:
+            for msg in messages:
+                if expired.is_set():
+                    # Keep what is classified, but leave the source's cursor
+                    # alone so the rest is picked up next scan.
+                    result["error"] = "deadline exceeded"
+                    break
+                if msg.category:
+                    classified.append((msg, msg.category, msg.reason, 1.0))
+                else:
+                    classified.append((msg, *classifier.classify(msg.sender, msg.subject, msg.preview)))
+        except Exception as exc:
+            # A streaming source failed part way: same as above.
+            print(f"ERROR: {source.label}: {exc}", file=sys.stderr)
+            result["error"] = str(exc)
+
+        # Second pass: full bodies, fetched together, for unsure snippets only.
+        unsure = [msg for msg, _, reason, confidence in classified
+                  if confidence < LOW_CONFIDENCE and reason.startswith("[ollama]")]
+        bodies = {}
+        if unsure and not expired.is_set():
+            try:
+                bodies = source.fetch_bodies(unsure, BODY_MAX_BYTES)
+            except Exception as exc:
+                print(f"WARNING: {source.label}: full-body fetch failed: {exc}", file=sys.stderr)
+            if bodies:
+                say(f"  [body] re-classifying {len(bodies)} unsure email(s) from full bodies")
+
+        entries = {}
+        for msg, category, reason, _ in classified:
+            if bodies.get(msg.key) and not expired.is_set():
+                category, reason, _ = classifier.classify(msg.sender, msg.subject, msg.preview,
+                                                          body=bodies[msg.key])
+            entries[msg.key] = {
+                "id": msg.id,
+                "subject": msg.subject,
+                "from": msg.sender,
+                "date": msg.date,
+                "preview": msg.preview[:200],
+                "category": category,
+                "reason": reason,
+                "account": source.account,
+                "source": source.name,
+                "surfaced": False,
+                "triaged_at": now_iso(),
+            }
+            icon = CATEGORY_ICONS.get(category, "⚪")
+            say(f"  {icon} [{category}] {msg.subject[:60]}",
+                f"     From: {msg.sender}",
+                f"     Reason: {reason}")
+
+        result["new"] = len(entries)
+        result["total_unread"] = total_unread
+        say(f"\n{source.label}: {len(entries)} newly triaged, {total_unread} total unread.")
+        return result, entries
+
+    # Daemon threads rather than an executor: a source stuck past the
+    # deadline (even after `cancel`) must not keep the process alive.
+    futures = [_start_daemon(scan_source, source) for source in sources]
+    wait(futures, timeout=deadline)
+    expired.set()
+
+    outcomes = []
+    for source, future in zip(sources, futures):
+        if future.done():
+            outcomes.append(future.result())
+            continue
+        try:
+            source.cancel()
+        except Exception:
+            pass
+        print(f"ERROR: {source.label}: no result within the {deadline:g}s scan deadline", file=sys.stderr)
+        outcomes.append(({"source": source.label, "account": source.account, "new": 0,
+                          "total_unread": 0, "error": "deadline exceeded"}, {}))
+
+    if not dry_run:
+        merged = {}
+        for _, entries in outcomes:
+            for key, entry in entries.items():
+                merged.setdefault(key, entry)
+        succeeded = [source for source, (result, _) in zip(sources, outcomes) if "error" not in result]
+
+        def apply(state: dict):
+            for source in succeeded:
+                source.commit(state)
+
+        # One locked merge for every source; prune keeps the newest entries
+        # and the seen-set remembers the rest.
+        triage_state.commit_entries(state_file, merged, max_entries=MAX_STATE_ENTRIES, apply=apply)
+
+    return [result for result, _ in outcomes]
+
+
+def report(state_file: Path, as_json: bool = False, account: str | None = None) -> list[dict]:
+    """Report unsurfaced important emails (urgent + needs-response)."""
+    state = triage_state.load_state(state_file)
+    # Already ordered by priority (urgent first), then by date
+    important = triage_state.pending_important(state, account)
+
+    if as_json:
+        print(json.dumps({"count": len(important), "emails": important}, indent=2))
+    else:
+        if not important:
+            print("✅ No important unsurfaced emails.")
+        else:
+            print(f"📬 {len(important)} email(s) needing attention:\n")
+            for e in important:
+                icon = CATEGORY_ICONS[e["category"]]
+                acct = e.get("account", "").split("@")[0]
+                prefix = f"[{acct}] " if acct else ""
+                print(f"  {icon} {prefix}{e['subject']}")
+                print(f"     From: {e['from']}")
+                print(f"     Date: {e['date']}")
+                print(f"     {e['category']} — {e['reason']}")
+                print()
+
+    return important
+
+
+def mark_surfaced(state_file: Path, keys: list[str] | None = None):
+    """Mark important emails as surfaced after they've been reported.
+
+    With keys, only those emails are marked; otherwise every pending one is.
+    """
+    count = triage_state.mark_surfaced(state_file, keys)
+    print(f"Marked {count} email(s) as surfaced.")
+
+
+def stats(state_file: Path):
+    """Show triage statistics."""
+    state = triage_state.load_state(state_file)
+    index = state["index"]
+
+    print("📊 Email Triage Stats")
+    print(f"  Last check: {state.get('last_check', 'never')}")
+    print(f"  Total triaged: {len(state['emails'])}")
+    print("\n  By category:")
+    for cat, count in index["categories"].items():
+        print(f"    {CATEGORY_ICONS.get(cat, '⚪')} {cat}: {count}")
+    print("\n  Unsurfaced important:")
+    print(f"    🔴 urgent: {index['unsurfaced']['urgent']}")
+    print(f"    🟡 needs-response: {index['unsurfaced']['needs-response']}")
+    print("\n  By account:")
+    for acct, count in index["accounts"].items():
+        print(f"    {acct or 'unknown'}: {count}")
+
+
+# ---------------------------------------------------------------------------
+# CLI entry point
+# ---------------------------------------------------------------------------
+
+def main(description: str, state_file: Path, ollama_url: str, ollama_model: str,
+         default_sources: list[str], default_account: str = ""):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "command",
+        choices=["scan", "report", "mark-surfaced", "stats", "serve"],
+        help="Command to run",
+    )
+    parser.add_argument(
+        "--source", "-s", action="append", metavar="SPEC",
+        help=f"scan: imap, gog:ACCOUNT or mbox:PATH; repeatable (default: {' '.join(default_sources)})",
+    )
+    parser.add_argument("--account", "-a", action="append",
+                        help="Gmail account for the gog source; repeatable, or a comma-separated "
+                             "list (default: GOG_ACCOUNT); filters report")
+    parser.add_argument("--dry-run", action="store_true", help="Scan without saving state")
+    parser.add_argument("--deadline", type=float, default=SCAN_DEADLINE, metavar="SECONDS",
+                        help=f"scan: give up on sources still running after this long (default: {SCAN_DEADLINE})")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
+    parser.add_argument("--keys", nargs="+", help="mark-surfaced: only these email keys (from report --json)")
+    parser.add_argument("--socket", type=Path, help="serve: Unix socket path (default: <state>.sock)")
+    parser.add_argument("--http", metavar="HOST:PORT", help="serve: listen on loopback HTTP instead of a Unix socket")
+    tapes = parser.add_mutually_exclusive_group()
+    tapes.add_argument("--record", type=Path, metavar="DIR", help="Record gog and Ollama traffic to DIR")
+    tapes.add_argument("--replay", type=Path, metavar="DIR",
+                       help="Answer gog and Ollama calls from a recording in DIR (no gog or model needed)")
+    args = parser.parse_args()
+    accounts = split_accounts(args.account or [default_account])
+
+    if args.command == "scan":
+        try:
+            sources = [
+                make_source(spec, account)
+                for spec in args.source or default_sources
+                # A bare "gog" scans every account; other specs ignore it.
+                for account in ((accounts or [""]) if spec == "gog" else [""])
+            ]
+        except SourceError as exc:
+            print(f"ERROR: {exc}", file=sys.stderr)
+            sys.exit(1)
+        tape = None
+        if args.record or args.replay:
+            try:
+                tape = cassette.Cassette(args.record or args.replay, "record" if args.record else "replay")
+            except FileNotFoundError as exc:
+                print(f"ERROR: {exc}", file=sys.stderr)
+                sys.exit(1)
+            cassette.use(tape)
+        classifier = Classifier(OllamaClient(ollama_url, ollama_model))
+        results = scan(sources, state_file, classifier, dry_run=args.dry_run,
+                       verbose=args.verbose or args.dry_run, deadline=args.deadline)
+        if tape is not None:
+            tape.save()
+        if args.json:
+            print(json.dumps(results[0] if len(results) == 1 else results, indent=2))
+        if all("error" in result for result in results):
+            sys.exit(1)
+    elif args.command == "report":
+        report(state_file, as_json=args.json, account=accounts[0] if len(accounts) == 1 else None)
+    elif args.command == "mark-surfaced":
+        mark_surfaced(state_file, args.keys)
+    elif args.command == "stats":
+        stats(state_file)
+    elif args.command == "serve":
+        triage_server.serve(state_file, socket_path=args.socket, http=args.http)
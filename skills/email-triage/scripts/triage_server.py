@@ -0,0 +1,180 @@
+"""Long-lived query daemon for triage report/stats/mark-surfaced.
+
+A heartbeat check that spawns Python, imports imaplib and re-parses the state
+file just to answer `report --json` costs hundreds of milliseconds. `serve`
+keeps the state in memory instead and answers small JSON requests over HTTP,
+either on a Unix socket (default: `<state>.sock`) or on a loopback port:
+
+    curl --unix-socket data/email-triage.sock http://triage/report
+    curl --unix-socket data/email-triage.sock http://triage/report?account=me@example.com
+    curl --unix-socket data/email-triage.sock http://triage/stats
+    curl --unix-socket data/email-triage.sock -d '{"keys": ["<key>"]}' http://triage/mark-surfaced
+
+The scanner keeps writing the state file as usual. Each request stats the
+file and reloads it only when it was replaced, so answers are never stale and
+the common case is a dict lookup.
+"""
+
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import triage_state
+
+
+class StateCache:
+    """In-memory triage state, reloaded when the file on disk changes."""
+
+    def __init__(self, state_file: Path):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._state = None
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.state_file)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def get(self) -> dict:
+        with self._lock:
+            stamp = self._file_stamp()
+            if self._state is None or stamp != self._stamp:
+                self._state = triage_state.load_state(self.state_file)
+                self._stamp = stamp
+            return self._state
+
+
+def stats_summary(state: dict) -> dict:
+    index = state["index"]
+    return {
+        "last_check": state.get("last_check"),
+        "total": len(state["emails"]),
+        "categories": index["categories"],
+        "unsurfaced": index["unsurfaced"],
+        "accounts": index["accounts"],
+    }
+
+
+class RequestError(Exception):
+    """A request the server refuses, with the HTTP status to answer."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def handle(cache: StateCache, command: str, params: dict) -> dict:
+    """Answer one request. Raises RequestError for unknown commands or bad params."""
+    if command == "ping":
+        return {"ok": True}
+    if command == "report":
+        emails = triage_state.pending_important(cache.get(), params.get("account"))
+        return {"count": len(emails), "emails": emails}
+    if command == "stats":
+        return stats_summary(cache.get())
+    if command == "mark-surfaced":
+        keys = params.get("keys")
+        if keys is not None and not (isinstance(keys, list) and all(isinstance(key, str) for key in keys)):
+            raise RequestError(400, "keys must be a list of strings")
+        count = triage_state.mark_surfaced(cache.state_file, keys)
+        return {"marked": count}
+    raise RequestError(404, f"unknown command: {command}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "email-triage"
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, params: dict):
+        command = urlsplit(self.path).path.strip("/")
+        try:
+            self._reply(200, handle(self.server.cache, command, params))
+        except RequestError as exc:
+            self._reply(exc.status, {"error": str(exc)})
+        except Exception as exc:
+            # A bug or a broken state file, not a bad request.
+            print(f"email-triage serve: {command} failed: {exc!r}", file=sys.stderr)
+            self._reply(500, {"error": f"{command} failed: {exc}"})
+
+    def do_GET(self):
+        if urlsplit(self.path).path.strip("/") == "mark-surfaced":
+            self._reply(405, {"error": "mark-surfaced requires POST"})
+            return
+        query = parse_qs(urlsplit(self.path).query)
+        self._dispatch({name: values[-1] for name, values in query.items()})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._reply(400, {"error": "invalid JSON body"})
+            return
+        if not isinstance(params, dict):
+            self._reply(400, {"error": "body must be a JSON object"})
+            return
+        self._dispatch(params)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def default_socket_path(state_file: Path) -> Path:
+    return state_file.with_suffix(".sock")
+
+
+def serve(state_file: Path, socket_path: Path | None = None, http: str | None = None):
+    """Serve triage queries until interrupted."""
+    cache = StateCache(state_file)
+    cache.get()
+
+    if http:
+        host, _, port = http.rpartition(":")
+        server = _TCPHTTPServer((host or "127.0.0.1", int(port)), _Handler)
+        where = f"http://{host or '127.0.0.1'}:{port}"
+    else:
+        socket_path = socket_path or default_socket_path(state_file)
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if socket_path.exists():
+            socket_path.unlink()
+        server = _UnixHTTPServer(str(socket_path), _Handler)
+        os.chmod(socket_path, 0o600)
+        where = f"unix:{socket_path}"
+
+    server.cache = cache
+    # Turn `kill` into a normal exit so the socket file gets cleaned up.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"email-triage serving {state_file} on {where}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not http and socket_path.exists():
+            socket_path.unlink()
@@ -0,0 +1,284 @@
+"""Triage state store shared by email-triage.py and gog-triage.py.
+
+The state file is read and written by several overlapping processes (a
+heartbeat `scan` → `report` → `mark-surfaced` chain plus manual scans), so:
+
+  * Writes are atomic (temp file + rename). Readers never see a torn file and
+    never need a lock — `report` and `stats` just call `load_state`.
+  * Writers take an advisory fcntl lock on `<state>.lock` only for the short
+    commit window, re-read the file under the lock and merge their changes
+    into it, so concurrent runs don't lose each other's updates.
+
+Slow work (IMAP/gog fetches, Ollama) happens outside the lock; a scan only
+holds it while folding its new entries into the latest on-disk state.
+
+Alongside the entries the state keeps a materialized `index`, maintained
+incrementally on every add/remove/surface, so `stats` is O(1) and `report`
+is O(results) instead of scanning and sorting all of history:
+
+  categories   entry count per category
+  accounts     entry count per account ("unknown" for IMAP entries)
+  unsurfaced   unsurfaced count per important category
+  important    sorted [priority, date, key] rows for unsurfaced important mail
+  domains      [total, spam] entry counts per sender domain
+"""
+
+import bisect
+import email.utils
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import seen_set
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, last writer wins
+    fcntl = None
+
+
+CATEGORIES = ("urgent", "needs-response", "informational", "spam")
+IMPORTANT = ("urgent", "needs-response")
+PRIORITY = {"urgent": 0, "needs-response": 1}
+INDEX_VERSION = 2
+
+
+def _lock_path(state_file: Path) -> Path:
+    return state_file.with_suffix(".lock")
+
+
+def empty_state() -> dict:
+    state = {"last_check": None, "emails": {}}
+    rebuild_index(state)
+    return state
+
+
+def load_state(state_file: Path) -> dict:
+    """Load triage state from disk. Lock-free; safe for read-only commands."""
+    if state_file.exists():
+        try:
+            with open(state_file) as f:
+                state = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            pass
+        else:
+            if state.get("index", {}).get("version") != INDEX_VERSION:
+                # State written before this index layout existed: build it once.
+                rebuild_index(state)
+            return state
+    return empty_state()
+
+
+def save_state(state_file: Path, state: dict):
+    """Atomically write triage state to disk. Callers should hold the lock."""
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    state["last_check"] = datetime.now(timezone.utc).isoformat()
+    tmp = state_file.with_name(state_file.name + f".{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, state_file)
+
+
+# ---------------------------------------------------------------------------
+# Materialized index
+# ---------------------------------------------------------------------------
+
+def _index_row(key: str, entry: dict) -> list:
+    return [PRIORITY[entry["category"]], entry.get("date", ""), key]
+
+
+def _is_pending(entry: dict) -> bool:
+    return not entry.get("surfaced") and entry.get("category") in IMPORTANT
+
+
+def _count(counter: dict, name: str, delta: int):
+    counter[name] = counter.get(name, 0) + delta
+    if not counter[name] and name not in CATEGORIES:
+        del counter[name]
+
+
+def sender_domain(sender: str) -> str:
+    """Lower-cased domain of a From header ("" if there is none)."""
+    _, addr = email.utils.parseaddr(sender)
+    return addr.rpartition("@")[2].lower() if "@" in addr else ""
+
+
+def _count_domain(domains: dict, entry: dict, delta: int):
+    domain = sender_domain(entry.get("from", ""))
+    if not domain:
+        return
+    counts = domains.setdefault(domain, [0, 0])
+    counts[0] += delta
+    if entry.get("category") == "spam":
+        counts[1] += delta
+    if not counts[0]:
+        del domains[domain]
+
+
+def _index_entry(index: dict, key: str, entry: dict, delta: int):
+    _count(index["categories"], entry.get("category", "informational"), delta)
+    _count(index["accounts"], entry.get("account", "unknown"), delta)
+    _count_domain(index["domains"], entry, delta)
+    if _is_pending(entry):
+        _count(index["unsurfaced"], entry["category"], delta)
+        row = _index_row(key, entry)
+        if delta > 0:
+            bisect.insort(index["important"], row)
+        else:
+            pos = bisect.bisect_left(index["important"], row)
+            if pos < len(index["important"]) and index["important"][pos] == row:
+                index["important"].pop(pos)
+
+
+def rebuild_index(state: dict):
+    """Recompute the index from scratch (only needed for legacy state files)."""
+    state["index"] = {
+        "version": INDEX_VERSION,
+        "categories": {cat: 0 for cat in CATEGORIES},
+        "accounts": {},
+        "unsurfaced": {cat: 0 for cat in IMPORTANT},
+        "important": [],
+        "domains": {},
+    }
+    for key, entry in state["emails"].items():
+        _index_entry(state["index"], key, entry, +1)
+
+
+def add_entry(state: dict, key: str, entry: dict) -> bool:
+    """Add an entry unless the key is already present. Returns True if added."""
+    if key in state["emails"]:
+        return False
+    state["emails"][key] = entry
+    _index_entry(state["index"], key, entry, +1)
+    return True
+
+
+def remove_entry(state: dict, key: str):
+    entry = state["emails"].pop(key, None)
+    if entry is not None:
+        _index_entry(state["index"], key, entry, -1)
+
+
+def surface_entry(state: dict, key: str) -> bool:
+    """Mark one entry surfaced. Returns True if it was pending."""
+    entry = state["emails"].get(key)
+    if entry is None or not _is_pending(entry):
+        return False
+    _index_entry(state["index"], key, entry, -1)
+    entry["surfaced"] = True
+    _index_entry(state["index"], key, entry, +1)
+    return True
+
+
+def pending_important(state: dict, account: str | None = None) -> list[dict]:
+    """Unsurfaced urgent/needs-response entries, urgent first, then by date."""
+    emails = state["emails"]
+    results = []
+    for _, _, key in state["index"]["important"]:
+        entry = emails[key]
+        if account and entry.get("account") != account:
+            continue
+        results.append({"key": key, **entry})
+    return results
+
+
+# Shared mail providers: a few spam senders there say nothing about the
+# domain, so these are never learned as spam domains.
+COMMON_DOMAINS = frozenset({
+    "gmail.com", "googlemail.com", "outlook.com", "hotmail.com", "live.com", "msn.com",
+    "yahoo.com", "ymail.com", "aol.com", "icloud.com", "me.com", "mac.com",
+    "proton.me", "protonmail.com", "pm.me", "gmx.com", "gmx.de", "gmx.net", "web.de",
+    "mail.com", "mail.ru", "yandex.ru", "yandex.com", "qq.com", "163.com", "126.com",
+    "zoho.com", "fastmail.com", "hey.com", "t-online.de", "orange.fr", "free.fr",
+    "libero.it", "comcast.net", "att.net", "verizon.net", "btinternet.com",
+})
+
+
+def spam_domains(state: dict, min_count: int = 3) -> list[str]:
+    """Sender domains whose every triaged email (at least min_count) was spam.
+
+    Free-mail and other shared domains (COMMON_DOMAINS) are never returned.
+    """
+    return sorted(
+        domain for domain, (total, spam) in state["index"]["domains"].items()
+        if total >= min_count and spam == total and domain not in COMMON_DOMAINS
+    )
+
+
+def load_seen(state_file: Path) -> seen_set.SeenSet:
+    """Load the seen-set snapshot for dedup checks during a scan."""
+    return seen_set.load(seen_set.seen_path_for(state_file))
+
+
+@contextmanager
+def locked(state_file: Path):
+    """Hold the exclusive advisory lock for a state file."""
+    lock_file = _lock_path(state_file)
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_file, "a") as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+@contextmanager
+def transaction(state_file: Path):
+    """Lock, re-read the latest state, yield it for mutation, then save it."""
+    with locked(state_file):
+        state = load_state(state_file)
+        yield state
+        save_state(state_file, state)
+
+
+def prune(state: dict, max_entries: int):
+    """Drop the oldest entries beyond max_entries (the seen-set keeps them)."""
+    if len(state["emails"]) <= max_entries:
+        return
+    sorted_keys = sorted(
+        state["emails"].keys(),
+        key=lambda k: state["emails"][k].get("triaged_at", ""),
+        reverse=True,
+    )
+    for key in sorted_keys[max_entries:]:
+        remove_entry(state, key)
+
+
+def commit_entries(state_file: Path, entries: dict[str, dict], max_entries: int,
+                   apply=None) -> dict:
+    """Merge newly triaged entries into the on-disk state and seen-set.
+
+    Entries another process committed in the meantime win, so a concurrent
+    `mark-surfaced` is never undone by a slower scan. `apply(state)`, if
+    given, runs inside the same transaction (sources use it to save sync
+    cursors). Returns the merged state.
+    """
+    seen_file = seen_set.seen_path_for(state_file)
+    with transaction(state_file) as state:
+        for key, entry in entries.items():
+            add_entry(state, key, entry)
+        if apply is not None:
+            apply(state)
+
+        seen = seen_set.load(seen_file)
+        if not len(seen):
+            # First run with a seen-set: seed it from whatever state still holds.
+            seen.update(state["emails"])
+        seen.update(entries)
+        seen_set.save(seen, seen_file)
+
+        prune(state, max_entries)
+    return state
+
+
+def mark_surfaced(state_file: Path, keys: list[str] | None = None) -> int:
+    """Mark important entries as surfaced: the given keys, or all pending ones."""
+    with transaction(state_file) as state:
+        if keys is None:
+            keys = [key for _, _, key in state["index"]["important"]]
+        return sum(1 for key in keys if surface_entry(state, key))
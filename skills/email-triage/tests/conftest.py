@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import triage_state  # noqa: E402
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return tmp_path / "triage.json"
+
+
+def make_entry(category="informational", sender="a@example.com", account="me@example.com",
+               date="2025-01-01", triaged_at="2025-01-01T00:00:00+00:00", surfaced=False):
+    return {
+        "id": "",
+        "subject": "Subject",
+        "from": sender,
+        "date": date,
+        "preview": "",
+        "category": category,
+        "reason": "[test]",
+        "account": account,
+        "source": "test",
+        "surfaced": surfaced,
+        "triaged_at": triaged_at,
+    }
+
+
+def assert_index_consistent(state):
+    """The incrementally maintained index equals one rebuilt from scratch."""
+    expected = {"emails": state["emails"]}
+    triage_state.rebuild_index(expected)
+    assert state["index"] == expected["index"]
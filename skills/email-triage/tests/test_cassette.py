@@ -0,0 +1,37 @@
+import pytest
+
+import cassette
+import source_gog
+
+
+@pytest.fixture(autouse=True)
+def no_cassette():
+    yield
+    cassette.use(None)
+
+
+def test_recorded_gog_calls_replay_without_gog(tmp_path, monkeypatch):
+    responses = iter([{"historyId": "1"}, {"historyId": "2"}])
+    recording = cassette.Cassette(tmp_path, "record")
+    cassette.use(recording)
+    session = source_gog.GogSession()
+    monkeypatch.setattr(session, "_run", lambda argv: next(responses))
+    args = ["gmail", "history", "--since", "1"]
+    assert session.run(args, "me@example.com") == {"historyId": "1"}
+    assert session.run(args, "me@example.com") == {"historyId": "2"}
+    recording.save()
+
+    cassette.use(cassette.Cassette(tmp_path, "replay"))
+    session = source_gog.GogSession()
+    monkeypatch.setattr(session, "_run", lambda argv: pytest.fail("replay must not run gog"))
+    # Responses replay in order, then the last one repeats.
+    assert [session.run(args, "me@example.com") for _ in range(3)] == [
+        {"historyId": "1"}, {"historyId": "2"}, {"historyId": "2"},
+    ]
+    # A request that was never recorded behaves like a failed gog call.
+    assert session.run(args, "other@example.com") is None
+
+
+def test_replay_needs_an_existing_cassette(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        cassette.Cassette(tmp_path / "missing", "replay")
@@ -0,0 +1,53 @@
+import multiprocessing
+
+from conftest import assert_index_consistent, make_entry
+
+import triage_state
+
+
+def _commit(state_file, prefix, count):
+    for i in range(count):
+        triage_state.commit_entries(
+            state_file,
+            {f"{prefix}{i}": make_entry("urgent", triaged_at=f"2025-01-01T00:{i:02d}:00+00:00")},
+            max_entries=1000,
+        )
+
+
+def test_concurrent_commits_merge_instead_of_overwriting(state_file):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_commit, args=(state_file, prefix, 25)) for prefix in ("a", "b")]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    state = triage_state.load_state(state_file)
+    assert len(state["emails"]) == 50
+    assert_index_consistent(state)
+    seen = triage_state.load_seen(state_file)
+    assert all(f"{prefix}{i}" in seen for prefix in "ab" for i in range(25))
+
+
+def test_slow_scan_does_not_undo_mark_surfaced(state_file):
+    triage_state.commit_entries(state_file, {"k": make_entry("urgent")}, max_entries=10)
+    # A scan loaded the state before this mark-surfaced and commits after it.
+    stale = triage_state.load_state(state_file)
+    triage_state.mark_surfaced(state_file, ["k"])
+
+    triage_state.commit_entries(state_file, {"k": stale["emails"]["k"], "new": make_entry("urgent")},
+                                max_entries=10)
+
+    state = triage_state.load_state(state_file)
+    assert state["emails"]["k"]["surfaced"] is True
+    assert [entry["key"] for entry in triage_state.pending_important(state)] == ["new"]
+    assert_index_consistent(state)
+
+
+def test_apply_runs_inside_the_commit(state_file):
+    def apply(state):
+        state.setdefault("cursors", {})["test"] = {"history_id": "7"}
+
+    triage_state.commit_entries(state_file, {"k": make_entry()}, max_entries=10, apply=apply)
+    assert triage_state.load_state(state_file)["cursors"] == {"test": {"history_id": "7"}}
@@ -0,0 +1,141 @@
+import pytest
+
+import source_gog
+import triage_engine
+import triage_state
+
+
+class FakeGmail:
+    """Answers the gog calls GogSource makes, from an in-memory inbox."""
+
+    def __init__(self, unread_ids):
+        self.unread = list(unread_ids)  # newest first
+        self.labels = {}
+        self.subjects = {}
+        self.history_id = 100
+        self.new_since = []  # ids the next history call reports as new unread
+        self.read_since = []
+        self.calls = []
+
+    def message(self, mid):
+        return {
+            "id": mid,
+            "subject": self.subjects.get(mid, f"Subject {mid}"),
+            "from": "sender@example.com",
+            "snippet": "hello",
+            "labelIds": self.labels.get(mid, ["INBOX", "UNREAD"]),
+            "historyId": str(self.history_id),
+        }
+
+    def __call__(self, args, account=None, session=None):
+        self.calls.append(list(args))
+        if args[:3] == ["gmail", "messages", "search"]:
+            query, size = args[3], int(args[args.index("--max") + 1])
+            if query == "in:anywhere":
+                return {"messages": [self.message(self.unread[0])] if self.unread else [{"id": "read-1"}]}
+            start = int(args[args.index("--page") + 1]) if "--page" in args else 0
+            page = {"messages": [self.message(mid) for mid in self.unread[start:start + size]],
+                    "resultSizeEstimate": len(self.unread)}
+            if start + size < len(self.unread):
+                page["nextPageToken"] = str(start + size)
+            return page
+        if args[:2] == ["gmail", "history"]:
+            history = [{"messagesAdded": [{"message": {"id": mid, "labelIds": ["INBOX", "UNREAD"]}}]}
+                       for mid in self.new_since]
+            history += [{"labelsRemoved": [{"message": {"id": mid, "labelIds": ["INBOX"]}, "labelIds": ["UNREAD"]}]}
+                        for mid in self.read_since]
+            self.new_since, self.read_since = [], []
+            return {"history": history, "historyId": str(self.history_id)}
+        if args[:3] == ["gmail", "messages", "get"]:
+            return {**self.message(args[3]), "historyId": str(self.history_id)}
+        raise AssertionError(f"unexpected gog call {args}")
+
+    def searches(self):
+        return [call for call in self.calls if call[:3] == ["gmail", "messages", "search"]]
+
+
+@pytest.fixture
+def gmail(monkeypatch):
+    fake = FakeGmail([f"old{i}" for i in range(45)])
+    monkeypatch.setattr(source_gog, "run_gog", fake)
+    return fake
+
+
+def scan(state_file):
+    source = source_gog.GogSource("me@example.com")
+    [result] = triage_engine.scan([source], state_file, triage_engine.Classifier(None))
+    assert "error" not in result
+    return result
+
+
+def cursor(state_file):
+    return triage_state.load_state(state_file)["cursors"]["gog:me@example.com"]
+
+
+def test_backlog_drains_across_scans_then_only_history_is_checked(gmail, state_file):
+    assert [scan(state_file)["new"] for _ in range(3)] == [20, 20, 5]
+    assert len(triage_state.load_state(state_file)["emails"]) == 45
+    assert "page_tokens" not in cursor(state_file)
+
+    gmail.calls.clear()
+    result = scan(state_file)
+    assert result["new"] == 0
+    assert result["total_unread"] == 45  # kept in the cursor, not searched again
+    assert gmail.calls == [["gmail", "history", "--since", "100"]]
+
+
+def test_burst_during_a_backlog_walk_is_finished_first(gmail, state_file):
+    scan(state_file)
+    assert cursor(state_file)["page_tokens"] == ["20"]
+
+    gmail.unread[:0] = [f"new{i}" for i in range(30)]
+    gmail.history_id, gmail.new_since = 200, [f"new{i}" for i in range(30)]
+    assert scan(state_file)["new"] == 20
+    assert cursor(state_file)["page_tokens"] == ["20", "20"]
+
+    for _ in range(3):
+        scan(state_file)
+    emails = triage_state.load_state(state_file)["emails"]
+    assert sorted(emails) == sorted([f"new{i}" for i in range(30)] + [f"old{i}" for i in range(45)])
+
+
+def test_messages_read_elsewhere_are_surfaced_and_counted(gmail, state_file):
+    gmail.unread = ["a", "b"]
+    gmail.subjects = {"a": "Production outage", "b": "Database outage"}
+    scan(state_file)
+    assert cursor(state_file)["unread"] == 2
+    assert len(triage_state.pending_important(triage_state.load_state(state_file))) == 2
+
+    gmail.unread, gmail.read_since = ["b"], ["a"]
+    result = scan(state_file)
+    assert result["total_unread"] == 1
+    pending = triage_state.pending_important(triage_state.load_state(state_file))
+    assert [entry["key"] for entry in pending] == ["b"]
+
+
+def test_empty_inbox_still_gets_a_history_cursor(gmail, state_file):
+    gmail.unread = []
+    assert scan(state_file)["total_unread"] == 0
+    assert cursor(state_file)["history_id"] == "100"
+
+    gmail.calls.clear()
+    scan(state_file)
+    assert gmail.searches() == []
+
+
+def test_gmail_labels_bypass_the_classifier(gmail, state_file):
+    gmail.unread = ["promo", "primary"]
+    gmail.labels["promo"] = ["INBOX", "UNREAD", "CATEGORY_PROMOTIONS"]
+    scan(state_file)
+    emails = triage_state.load_state(state_file)["emails"]
+    assert emails["promo"]["category"] == "spam"
+    assert emails["promo"]["reason"] == "[gmail] labelled CATEGORY_PROMOTIONS"
+    assert emails["primary"]["reason"].startswith("[heuristic]")
+
+
+def test_cancelling_one_source_leaves_the_others_alone():
+    first, second = source_gog.GogSource("a@example.com"), source_gog.GogSource("b@example.com")
+    first.cancel()
+    assert first.session.run(["gmail", "history", "--since", "1"]) is None
+    assert first.session is not second.session
+    assert not second.session._cancelled
@@ -0,0 +1,26 @@
+import email.message
+import mailbox
+
+import triage_engine
+import triage_state
+from source_mbox import MboxSource
+
+
+def test_unread_backlog_is_reached_across_scans(tmp_path, state_file):
+    path = tmp_path / "inbox.mbox"
+    box = mailbox.mbox(path)
+    for i in range(45):
+        msg = mailbox.mboxMessage(email.message.EmailMessage())
+        msg["Subject"], msg["From"], msg["Message-ID"] = f"Message {i}", "a@example.com", f"<m{i}@example.com>"
+        if i % 10 == 0:
+            msg.set_flags("RO")
+        box.add(msg)
+    box.flush()
+    box.close()
+
+    news = []
+    for _ in range(4):
+        [result] = triage_engine.scan([MboxSource(str(path))], state_file, triage_engine.Classifier(None))
+        news.append(result["new"])
+    assert news == [20, 20, 0, 0]
+    assert len(triage_state.load_state(state_file)["emails"]) == 40
@@ -0,0 +1,34 @@
+import seen_set
+
+
+def test_round_trip_keeps_every_key(tmp_path):
+    seen = seen_set.SeenSet(capacity=100, error_rate=0.01)
+    keys = [f"<msg-{i}@example.com>" for i in range(1000)]  # grows past several stages
+    # A Bloom filter may call a few new keys present already (error_rate).
+    assert seen.update(keys) >= len(keys) * 0.97
+    assert len(seen.stages) > 1
+
+    path = tmp_path / "state.seen"
+    seen_set.save(seen, path)
+    loaded = seen_set.load(path)
+
+    assert loaded.to_bytes() == seen.to_bytes()
+    assert len(loaded) == len(seen)
+    assert all(key in loaded for key in keys)
+    assert loaded.add(keys[0]) is False
+
+
+def test_false_positive_rate_stays_near_the_target():
+    seen = seen_set.SeenSet(capacity=1000, error_rate=0.01)
+    seen.update(f"member-{i}" for i in range(5000))
+
+    probes = 20000
+    false_positives = sum(1 for i in range(probes) if f"other-{i}" in seen)
+    assert false_positives / probes <= 0.02
+
+
+def test_missing_or_corrupt_file_loads_empty(tmp_path):
+    assert len(seen_set.load(tmp_path / "missing.seen")) == 0
+    corrupt = tmp_path / "corrupt.seen"
+    corrupt.write_bytes(b"not a seen set")
+    assert len(seen_set.load(corrupt)) == 0
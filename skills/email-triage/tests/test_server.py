@@ -0,0 +1,75 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from conftest import make_entry
+
+import triage_server
+import triage_state
+
+
+@pytest.fixture
+def cache(state_file):
+    triage_state.commit_entries(
+        state_file,
+        {"u1": make_entry("urgent", account="me@example.com"), "i1": make_entry("informational")},
+        max_entries=10,
+    )
+    return triage_server.StateCache(state_file)
+
+
+def test_report_and_stats(cache):
+    report = triage_server.handle(cache, "report", {})
+    assert report["count"] == 1 and report["emails"][0]["key"] == "u1"
+    assert triage_server.handle(cache, "report", {"account": "other@example.com"})["count"] == 0
+    assert triage_server.handle(cache, "stats", {})["total"] == 2
+
+
+def test_cache_reloads_after_the_file_changes(cache, state_file):
+    assert triage_server.handle(cache, "report", {})["count"] == 1
+    triage_state.mark_surfaced(state_file, ["u1"])
+    assert triage_server.handle(cache, "report", {})["count"] == 0
+
+
+def test_unknown_command_is_404(cache):
+    with pytest.raises(triage_server.RequestError) as exc:
+        triage_server.handle(cache, "bogus", {})
+    assert exc.value.status == 404
+
+
+@pytest.mark.parametrize("keys", ["u1", [1], {"u1": True}, [None]])
+def test_mark_surfaced_rejects_malformed_keys(cache, keys):
+    with pytest.raises(triage_server.RequestError) as exc:
+        triage_server.handle(cache, "mark-surfaced", {"keys": keys})
+    assert exc.value.status == 400
+
+
+def test_http_round_trip_and_handler_errors(cache, monkeypatch):
+    server = triage_server._TCPHTTPServer(("127.0.0.1", 0), triage_server._Handler)
+    server.cache = cache
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def request(path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(base + path, data=data)) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as exc:
+            return exc.code, json.load(exc)
+
+    try:
+        assert request("/mark-surfaced", {"keys": ["u1"]}) == (200, {"marked": 1})
+        assert request("/mark-surfaced", {"keys": "u1"})[0] == 400
+        assert request("/mark-surfaced")[0] == 405
+        assert request("/nope")[0] == 404
+
+        # A KeyError inside a handler is a server error, not an unknown command.
+        monkeypatch.setattr(triage_server, "stats_summary", lambda state: state["missing"])
+        status, body = request("/stats")
+        assert status == 500 and "unknown command" not in body["error"]
+    finally:
+        server.shutdown()
+        server.server_close()
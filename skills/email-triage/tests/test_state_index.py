@@ -0,0 +1,65 @@
+from conftest import assert_index_consistent, make_entry
+
+import triage_state
+
+
+def test_index_tracks_commit_prune_and_surface(state_file):
+    entries = {
+        f"k{i}": make_entry(
+            category=["urgent", "needs-response", "informational", "spam"][i % 4],
+            sender=f"x@d{i % 3}.com",
+            account=f"acct{i % 2}",
+            date=f"2025-01-{i + 1:02d}",
+            triaged_at=f"2025-01-01T00:00:{i:02d}+00:00",
+        )
+        for i in range(12)
+    }
+    triage_state.commit_entries(state_file, entries, max_entries=100)
+    state = triage_state.load_state(state_file)
+    assert_index_consistent(state)
+    assert state["index"]["categories"] == {"urgent": 3, "needs-response": 3, "informational": 3, "spam": 3}
+    assert state["index"]["unsurfaced"] == {"urgent": 3, "needs-response": 3}
+
+    # Pruning drops the oldest entries and their index rows.
+    triage_state.commit_entries(state_file, {}, max_entries=8)
+    state = triage_state.load_state(state_file)
+    assert sorted(state["emails"]) == sorted(f"k{i}" for i in range(4, 12))
+    assert_index_consistent(state)
+
+    assert triage_state.mark_surfaced(state_file, ["k4", "k5", "k6", "missing"]) == 2
+    state = triage_state.load_state(state_file)
+    assert_index_consistent(state)
+    assert state["index"]["unsurfaced"] == {"urgent": 1, "needs-response": 1}
+
+    assert triage_state.mark_surfaced(state_file) == 2
+    state = triage_state.load_state(state_file)
+    assert_index_consistent(state)
+    assert state["index"]["important"] == []
+    assert triage_state.pending_important(state) == []
+
+
+def test_pending_important_is_urgent_first_then_by_date():
+    state = triage_state.empty_state()
+    triage_state.add_entry(state, "late-urgent", make_entry("urgent", date="2025-02-01"))
+    triage_state.add_entry(state, "early-reply", make_entry("needs-response", date="2025-01-01"))
+    triage_state.add_entry(state, "early-urgent", make_entry("urgent", date="2025-01-15"))
+    triage_state.add_entry(state, "noise", make_entry("spam"))
+
+    keys = [entry["key"] for entry in triage_state.pending_important(state)]
+    assert keys == ["early-urgent", "late-urgent", "early-reply"]
+
+
+def test_legacy_state_gets_an_index(state_file):
+    state_file.write_text('{"last_check": null, "emails": {"k": %s}}' % __import__("json").dumps(make_entry("urgent")))
+    state = triage_state.load_state(state_file)
+    assert state["index"]["version"] == triage_state.INDEX_VERSION
+    assert_index_consistent(state)
+
+
+def test_spam_domains_skip_mixed_and_common_domains():
+    state = triage_state.empty_state()
+    for i in range(3):
+        triage_state.add_entry(state, f"s{i}", make_entry("spam", sender=f"x@deals.example"))
+        triage_state.add_entry(state, f"g{i}", make_entry("spam", sender=f"x@gmail.com"))
+        triage_state.add_entry(state, f"m{i}", make_entry("spam" if i else "urgent", sender="x@mixed.example"))
+    assert triage_state.spam_domains(state) == ["deals.example"]
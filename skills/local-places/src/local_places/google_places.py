@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import os
 from typing import Any
@@ -7,6 +9,7 @@ from typing import Any
 import httpx
 from fastapi import HTTPException
 
+from local_places.cache import MISS, NOT_FOUND, TTLCache
 from local_places.schemas import (
     LatLng,
     LocationResolveRequest,
@@ -23,6 +26,31 @@ GOOGLE_PLACES_BASE_URL = os.getenv(
 )
 logger = logging.getLogger("local_places.google_places")
 
+# One pooled HTTP/2 client for the whole process, opened and closed by the
+# app lifespan (see main.py), so requests reuse warm TLS connections. The
+# pool is sized for thousands of concurrent upstream calls on one worker.
+_CLIENT_TIMEOUT = httpx.Timeout(10.0, connect=5.0, pool=10.0)
+_CLIENT_LIMITS = httpx.Limits(
+    max_connections=1000,
+    max_keepalive_connections=100,
+    keepalive_expiry=60.0,
+)
+_client: httpx.AsyncClient | None = None
+
+# Agents ask about the same places over and over, so details and searches
+# are cached in-process. 404s for details are remembered briefly too.
+_details_cache = TTLCache(
+    max_entries=int(os.getenv("PLACES_CACHE_MAX_ENTRIES", "2000")),
+    ttl=float(os.getenv("PLACES_CACHE_DETAILS_TTL", "600")),
+    negative_ttl=float(os.getenv("PLACES_CACHE_NEGATIVE_TTL", "60")),
+)
+_search_cache = TTLCache(
+    max_entries=int(os.getenv("PLACES_CACHE_MAX_ENTRIES", "2000")),
+    ttl=float(os.getenv("PLACES_CACHE_SEARCH_TTL", "300")),
+)
+# Location bias is rounded to about 100 m for the search cache key.
+_BIAS_KEY_DECIMALS = 3
+
 _PRICE_LEVEL_TO_ENUM = {
     0: "PRICE_LEVEL_FREE",
     1: "PRICE_LEVEL_INEXPENSIVE",
@@ -94,23 +122,81 @@ def _api_headers(field_mask: str) -> dict[str, str]:
     }
 
 
-def _request(
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(http2=True, timeout=_CLIENT_TIMEOUT, limits=_CLIENT_LIMITS)
+
+
+async def open_client() -> httpx.AsyncClient:
+    """Create the shared upstream client (closing any previous one)."""
+    global _client
+    await close_client()
+    _client = _new_client()
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared upstream client and its pooled connections."""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+
+async def _send(
+    client: httpx.AsyncClient, method: str, url: str, payload: dict[str, Any] | None, field_mask: str
+) -> httpx.Response:
+    return await client.request(
+        method=method,
+        url=url,
+        headers=_api_headers(field_mask),
+        json=payload,
+    )
+
+
+async def _request(
     method: str, url: str, payload: dict[str, Any] | None, field_mask: str
 ) -> _GoogleResponse:
     try:
-        with httpx.Client(timeout=10.0) as client:
-            response = client.request(
-                method=method,
-                url=url,
-                headers=_api_headers(field_mask),
-                json=payload,
-            )
+        if _client is not None:
+            response = await _send(_client, method, url, payload, field_mask)
+        else:
+            # Outside the app (scripts, tests) there is no shared client: a
+            # global one would be bound to whichever event loop used it first
+            # and never closed, so open a short-lived one for this call.
+            async with _new_client() as client:
+                response = await _send(client, method, url, payload, field_mask)
     except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail="Google Places API unavailable.") from exc
 
     return _GoogleResponse(response)
 
 
+def _upstream_error(status_code: int) -> HTTPException:
+    return HTTPException(
+        status_code=502,
+        detail=f"Google Places API error ({status_code}).",
+    )
+
+
+def _response_json(response: _GoogleResponse) -> dict[str, Any]:
+    if response.status_code >= 400:
+        logger.error(
+            "Google Places API error %s. response=%s",
+            response.status_code,
+            response.text,
+        )
+        raise _upstream_error(response.status_code)
+
+    try:
+        return response.json()
+    except ValueError as exc:
+        logger.error(
+            "Google Places API returned invalid JSON. response=%s",
+            response.text,
+        )
+        raise HTTPException(status_code=502, detail="Invalid Google response.") from exc
+
+
 def _build_text_query(request: SearchRequest) -> str:
     keyword = request.filters.keyword if request.filters else None
     if keyword:
@@ -154,6 +240,45 @@ def _build_search_body(request: SearchRequest) -> dict[str, Any]:
     return body
 
 
+def _normalize_text(value: str | None) -> str | None:
+    if value is None:
+        return None
+    return " ".join(value.split()).casefold()
+
+
+def _search_cache_key(request: SearchRequest) -> str:
+    """Canonical hash of a search, equal for requests Google would answer alike."""
+    bias = request.location_bias
+    filters = request.filters
+    normalized = {
+        "query": _normalize_text(request.query),
+        "bias": [
+            round(bias.lat, _BIAS_KEY_DECIMALS),
+            round(bias.lng, _BIAS_KEY_DECIMALS),
+            round(bias.radius_m),
+        ]
+        if bias
+        else None,
+        "filters": {
+            "keyword": _normalize_text(filters.keyword),
+            "type": filters.types[0] if filters.types else None,
+            "open_now": filters.open_now,
+            "min_rating": filters.min_rating,
+            "price_levels": sorted(set(filters.price_levels)) if filters.price_levels else None,
+        }
+        if filters
+        else None,
+        "limit": request.limit,
+        "page_token": request.page_token,
+    }
+    encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {"details": _details_cache.stats(), "search": _search_cache.stats()}
+
+
 def _parse_lat_lng(raw: dict[str, Any] | None) -> LatLng | None:
     if not raw:
         return None
@@ -188,29 +313,15 @@ def _parse_price_level(raw: str | None) -> int | None:
     return _ENUM_TO_PRICE_LEVEL.get(raw)
 
 
-def search_places(request: SearchRequest) -> SearchResponse:
-    url = f"{GOOGLE_PLACES_BASE_URL}/places:searchText"
-    response = _request("POST", url, _build_search_body(request), _SEARCH_FIELD_MASK)
+async def search_places(request: SearchRequest) -> SearchResponse:
+    key = _search_cache_key(request)
+    cached = _search_cache.get(key)
+    if cached is not MISS:
+        return cached
 
-    if response.status_code >= 400:
-        logger.error(
-            "Google Places API error %s. response=%s",
-            response.status_code,
-            response.text,
-        )
-        raise HTTPException(
-            status_code=502,
-            detail=f"Google Places API error ({response.status_code}).",
-        )
-
-    try:
-        payload = response.json()
-    except ValueError as exc:
-        logger.error(
-            "Google Places API returned invalid JSON. response=%s",
-            response.text,
-        )
-        raise HTTPException(status_code=502, detail="Invalid Google response.") from exc
+    url = f"{GOOGLE_PLACES_BASE_URL}/places:searchText"
+    response = await _request("POST", url, _build_search_body(request), _SEARCH_FIELD_MASK)
+    payload = _response_json(response)
 
     places = payload.get("places", [])
     results = []
@@ -228,37 +339,29 @@ def search_places(request: SearchRequest) -> SearchResponse:
             )
         )
 
-    return SearchResponse(
+    result = SearchResponse(
         results=results,
         next_page_token=payload.get("nextPageToken"),
     )
+    _search_cache.set(key, result)
+    return result
 
 
-def get_place_details(place_id: str) -> PlaceDetails:
-    url = f"{GOOGLE_PLACES_BASE_URL}/places/{place_id}"
-    response = _request("GET", url, None, _DETAILS_FIELD_MASK)
+async def get_place_details(place_id: str) -> PlaceDetails:
+    key = (place_id, _DETAILS_FIELD_MASK)
+    cached = _details_cache.get(key)
+    if cached is NOT_FOUND:
+        raise _upstream_error(404)
+    if cached is not MISS:
+        return cached
 
-    if response.status_code >= 400:
-        logger.error(
-            "Google Places API error %s. response=%s",
-            response.status_code,
-            response.text,
-        )
-        raise HTTPException(
-            status_code=502,
-            detail=f"Google Places API error ({response.status_code}).",
-        )
-
-    try:
-        payload = response.json()
-    except ValueError as exc:
-        logger.error(
-            "Google Places API returned invalid JSON. response=%s",
-            response.text,
-        )
-        raise HTTPException(status_code=502, detail="Invalid Google response.") from exc
+    url = f"{GOOGLE_PLACES_BASE_URL}/places/{place_id}"
+    response = await _request("GET", url, None, _DETAILS_FIELD_MASK)
+    if response.status_code == 404:
+        _details_cache.set_not_found(key)
+    payload = _response_json(response)
 
-    return PlaceDetails(
+    details = PlaceDetails(
         place_id=payload.get("id", place_id),
         name=_parse_display_name(payload.get("displayName")),
         address=payload.get("formattedAddress"),
@@ -271,32 +374,15 @@ def get_place_details(place_id: str) -> PlaceDetails:
         hours=_parse_hours(payload.get("regularOpeningHours")),
         open_now=_parse_open_now(payload.get("currentOpeningHours")),
     )
+    _details_cache.set(key, details)
+    return details
 
 
-def resolve_locations(request: LocationResolveRequest) -> LocationResolveResponse:
+async def resolve_locations(request: LocationResolveRequest) -> LocationResolveResponse:
     url = f"{GOOGLE_PLACES_BASE_URL}/places:searchText"
     body = {"textQuery": request.location_text, "pageSize": request.limit}
-    response = _request("POST", url, body, _RESOLVE_FIELD_MASK)
-
-    if response.status_code >= 400:
-        logger.error(
-            "Google Places API error %s. response=%s",
-            response.status_code,
-            response.text,
-        )
-        raise HTTPException(
-            status_code=502,
-            detail=f"Google Places API error ({response.status_code}).",
-        )
-
-    try:
-        payload = response.json()
-    except ValueError as exc:
-        logger.error(
-            "Google Places API returned invalid JSON. response=%s",
-            response.text,
-        )
-        raise HTTPException(status_code=502, detail="Invalid Google response.") from exc
+    response = await _request("POST", url, body, _RESOLVE_FIELD_MASK)
+    payload = _response_json(response)
 
     places = payload.get("places", [])
     results = []
@@ -1,12 +1,21 @@
 import logging
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
-from local_places.google_places import get_place_details, resolve_locations, search_places
+from local_places.google_places import (
+    cache_stats,
+    close_client,
+    get_place_details,
+    open_client,
+    resolve_locations,
+    search_places,
+)
 from local_places.schemas import (
     LocationResolveRequest,
     LocationResolveResponse,
@@ -15,18 +24,34 @@ from local_places.schemas import (
     SearchResponse,
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await open_client()
+    try:
+        yield
+    finally:
+        await close_client()
+
+
 app = FastAPI(
     title="My API",
     servers=[{"url": os.getenv("OPENAPI_SERVER_URL", "http://maxims-macbook-air:8000")}],
+    lifespan=lifespan,
 )
 logger = logging.getLogger("local_places.validation")
 
 
 @app.get("/ping")
-def ping() -> dict[str, str]:
+async def ping() -> dict[str, str]:
     return {"message": "pong"}
 
 
+@app.get("/cache/stats")
+async def cache_statistics() -> dict[str, dict[str, int]]:
+    return cache_stats()
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(
     request: Request, exc: RequestValidationError
@@ -45,18 +70,18 @@ async def validation_exception_handler(
 
 
 @app.post("/places/search", response_model=SearchResponse)
-def places_search(request: SearchRequest) -> SearchResponse:
-    return search_places(request)
+async def places_search(request: SearchRequest) -> SearchResponse:
+    return await search_places(request)
 
 
 @app.get("/places/{place_id}", response_model=PlaceDetails)
-def places_details(place_id: str) -> PlaceDetails:
-    return get_place_details(place_id)
+async def places_details(place_id: str) -> PlaceDetails:
+    return await get_place_details(place_id)
 
 
 @app.post("/locations/resolve", response_model=LocationResolveResponse)
-def locations_resolve(request: LocationResolveRequest) -> LocationResolveResponse:
-    return resolve_locations(request)
+async def locations_resolve(request: LocationResolveRequest) -> LocationResolveResponse:
+    return await resolve_locations(request)
 
 
 if __name__ == "__main__":
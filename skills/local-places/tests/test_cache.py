@@ -0,0 +1,69 @@
+from local_places.cache import MISS, NOT_FOUND, TTLCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_ttl() -> None:
+    clock = FakeClock()
+    cache = TTLCache(max_entries=10, ttl=60, clock=clock)
+    cache.set("a", 1)
+
+    clock.now += 59.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is MISS
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_negative_entries_use_their_own_ttl() -> None:
+    clock = FakeClock()
+    cache = TTLCache(max_entries=10, ttl=600, negative_ttl=30, clock=clock)
+    cache.set_not_found("gone")
+
+    assert cache.get("gone") is NOT_FOUND
+    clock.now += 30
+    assert cache.get("gone") is MISS
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_zero_ttl_disables_caching() -> None:
+    cache = TTLCache(max_entries=10, ttl=0)
+    cache.set("a", 1)
+    cache.set_not_found("b")
+
+    assert len(cache) == 0
+    assert cache.get("a") is MISS
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache = TTLCache(max_entries=2, ttl=60, clock=FakeClock())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISS
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_overwriting_a_key_does_not_evict() -> None:
+    cache = TTLCache(max_entries=2, ttl=60, clock=FakeClock())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 10)
+
+    assert len(cache) == 2
+    assert cache.get("a") == 10
+    assert cache.get("b") == 2
+    assert cache.stats()["evictions"] == 0
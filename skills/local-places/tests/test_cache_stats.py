@@ -0,0 +1,63 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from local_places import google_places
+from local_places.cache import TTLCache
+from local_places.main import app
+
+
+@pytest.fixture
+def upstream(monkeypatch: pytest.MonkeyPatch) -> list[httpx.Request]:
+    """Route upstream calls to a fake Places API and start with empty caches."""
+    calls: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if request.url.path.endswith("/places/missing"):
+            return httpx.Response(404, json={"error": {"code": 404}})
+        if request.method == "POST":
+            return httpx.Response(200, json={"places": [{"id": "p1", "displayName": {"text": "Cafe"}}]})
+        place_id = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json={"id": place_id, "displayName": {"text": "Cafe"}})
+
+    monkeypatch.setenv("GOOGLE_PLACES_API_KEY", "test-key")
+    monkeypatch.setattr(
+        google_places,
+        "_new_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    monkeypatch.setattr(google_places, "_details_cache", TTLCache(max_entries=2, ttl=600, negative_ttl=60))
+    monkeypatch.setattr(google_places, "_search_cache", TTLCache(max_entries=2, ttl=300))
+    return calls
+
+
+def test_cache_stats_reports_hits_misses_and_evictions(upstream: list[httpx.Request]) -> None:
+    with TestClient(app) as client:
+        for place_id in ("a", "a", "b", "c"):
+            assert client.get(f"/places/{place_id}").status_code == 200
+        for _ in range(2):
+            assert client.get("/places/missing").status_code == 502
+        for _ in range(2):
+            assert client.post("/places/search", json={"query": "coffee"}).status_code == 200
+
+        stats = client.get("/cache/stats").json()
+
+    # a, b, c and missing each reach upstream once; the repeats are served from cache.
+    assert len(upstream) == 5
+    assert stats["details"] == {
+        "entries": 2,
+        "max_entries": 2,
+        "hits": 1,
+        "negative_hits": 1,
+        "misses": 4,
+        "evictions": 2,
+    }
+    assert stats["search"] == {
+        "entries": 1,
+        "max_entries": 2,
+        "hits": 1,
+        "negative_hits": 0,
+        "misses": 1,
+        "evictions": 0,
+    }
@@ -8,13 +8,28 @@ Defaults to current model (most recent daily entry), or list all models.
 from __future__ import annotations
 
 import argparse
+import glob
 import json
 import os
 import subprocess
 import sys
-from dataclasses import dataclass
+import time
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+import usage_analysis
+import usage_ledger
+import usage_server
+
+NAN = float("nan")
+PROVIDERS = ["codex", "claude"]
+
+# Without a fingerprint (no local logs found) cached output expires after this.
+DEFAULT_CACHE_TTL = 300
 
 
 def eprint(msg: str) -> None:
@@ -22,7 +37,10 @@ def eprint(msg: str) -> None:
 
 
 def run_codexbar_cost(provider: str) -> List[Dict[str, Any]]:
-    cmd = ["codexbar", "cost", "--format", "json", "--provider", provider]
+    cmd = ["codexbar", "cost", "--format", "json"]
+    if provider != "all":
+        # Without --provider codexbar reports every provider in one run.
+        cmd += ["--provider", provider]
     try:
         output = subprocess.check_output(cmd, text=True)
     except FileNotFoundError:
@@ -38,16 +56,117 @@ def run_codexbar_cost(provider: str) -> List[Dict[str, Any]]:
     return payload
 
 
-def load_payload(input_path: Optional[str], provider: str) -> Dict[str, Any]:
-    if input_path:
-        if input_path == "-":
-            raw = sys.stdin.read()
-        else:
-            with open(input_path, "r", encoding="utf-8") as handle:
-                raw = handle.read()
-        data = json.loads(raw)
+def cache_dir() -> str:
+    """Per-user cache directory for model-usage."""
+    if sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
     else:
-        data = run_codexbar_cost(provider)
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "model-usage")
+
+
+def log_patterns(provider: str) -> List[str]:
+    """Globs for the local JSONL logs codexbar cost reads for a provider."""
+    if provider == "all":
+        return [pattern for name in PROVIDERS for pattern in log_patterns(name)]
+    if provider == "codex":
+        codex_home = os.environ.get("CODEX_HOME") or os.path.expanduser("~/.codex")
+        return [os.path.join(codex_home, "sessions", "**", "*.jsonl")]
+    if provider == "claude":
+        roots = [os.path.expanduser("~/.config/claude"), os.path.expanduser("~/.claude")]
+        if os.environ.get("CLAUDE_CONFIG_DIR"):
+            roots.insert(0, os.environ["CLAUDE_CONFIG_DIR"])
+        return [os.path.join(root, "projects", "**", "*.jsonl") for root in roots]
+    return []
+
+
+def log_fingerprint(provider: str) -> Optional[List[int]]:
+    """[file count, newest mtime (ns), total size] of the provider's logs.
+
+    Any appended, added or removed log changes it. None if no logs exist.
+    """
+    count = newest = size = 0
+    for pattern in log_patterns(provider):
+        for path in glob.iglob(pattern, recursive=True):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            count += 1
+            newest = max(newest, st.st_mtime_ns)
+            size += st.st_size
+    return [count, newest, size] if count else None
+
+
+def cached_codexbar_cost(
+    provider: str,
+    max_age: Optional[float] = None,
+    refresh: bool = False,
+) -> List[Dict[str, Any]]:
+    """`run_codexbar_cost`, cached on disk per provider.
+
+    By default the cache is reused while codexbar's source logs are
+    unchanged. With `max_age` (seconds) it is reused while younger than
+    that, without looking at the logs. `refresh` always re-runs codexbar.
+    """
+    path = os.path.join(cache_dir(), f"cost-{provider}.json")
+    fingerprint = None if max_age is not None else log_fingerprint(provider)
+    if not refresh:
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                cached = json.load(handle)
+            age = time.time() - cached["createdAt"]
+            if max_age is not None:
+                fresh = age <= max_age
+            elif fingerprint is not None:
+                fresh = cached.get("fingerprint") == fingerprint
+            else:
+                fresh = age <= DEFAULT_CACHE_TTL
+            if fresh and isinstance(cached.get("payload"), list):
+                return cached["payload"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    payload = run_codexbar_cost(provider)
+    if fingerprint is None and max_age is not None:
+        fingerprint = log_fingerprint(provider)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as handle:
+            json.dump({"createdAt": time.time(), "fingerprint": fingerprint, "payload": payload}, handle)
+        os.replace(tmp, path)
+    except OSError as exc:
+        eprint(f"Warning: could not write cache {path}: {exc}")
+    return payload
+
+
+def load_all_payloads(
+    max_age: Optional[float] = None,
+    refresh: bool = False,
+) -> List[Dict[str, Any]]:
+    """Every provider's payload, from one (cached) codexbar run."""
+    data = cached_codexbar_cost("all", max_age=max_age, refresh=refresh)
+
+    if isinstance(data, dict):
+        return [data]
+
+    if isinstance(data, list):
+        payloads = [entry for entry in data if isinstance(entry, dict) and isinstance(entry.get("provider"), str)]
+        if not payloads:
+            raise RuntimeError("No providers found in codexbar payload.")
+        return payloads
+
+    raise RuntimeError("Unsupported JSON input format.")
+
+
+def load_payload(
+    provider: str,
+    max_age: Optional[float] = None,
+    refresh: bool = False,
+) -> Dict[str, Any]:
+    """`provider`'s payload from a (cached) codexbar run."""
+    data = cached_codexbar_cost(provider, max_age=max_age, refresh=refresh)
 
     if isinstance(data, dict):
         return data
@@ -61,12 +180,6 @@ def load_payload(input_path: Optional[str], provider: str) -> Dict[str, Any]:
     raise RuntimeError("Unsupported JSON input format.")
 
 
-@dataclass
-class ModelCost:
-    model: str
-    cost: float
-
-
 def parse_daily_entries(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     daily = payload.get("daily")
     if not daily:
@@ -83,69 +196,407 @@ def parse_date(value: str) -> Optional[date]:
         return None
 
 
-def filter_by_days(entries: List[Dict[str, Any]], days: Optional[int]) -> List[Dict[str, Any]]:
-    if not days:
-        return entries
-    cutoff = date.today() - timedelta(days=days - 1)
-    filtered: List[Dict[str, Any]] = []
-    for entry in entries:
-        day = entry.get("date")
-        if not isinstance(day, str):
-            continue
-        parsed = parse_date(day)
-        if parsed and parsed >= cutoff:
-            filtered.append(entry)
-    return filtered
+def date_ordinal(value: Any) -> int:
+    """Proleptic ordinal of a YYYY-MM-DD string, or -1 if it isn't one."""
+    if not isinstance(value, str):
+        return -1
+    parsed = None
+    if len(value) == 10 and value[4] == "-" and value[7] == "-":
+        try:
+            parsed = date.fromisoformat(value)
+        except ValueError:
+            parsed = None
+    if parsed is None:
+        parsed = parse_date(value)
+    return parsed.toordinal() if parsed else -1
 
 
-def aggregate_costs(entries: Iterable[Dict[str, Any]]) -> Dict[str, float]:
-    totals: Dict[str, float] = {}
-    for entry in entries:
-        breakdowns = entry.get("modelBreakdowns")
-        if not breakdowns:
-            continue
-        if not isinstance(breakdowns, list):
-            continue
+@dataclass
+class UsageTable:
+    """Daily rows of one provider in a compact, date-sorted columnar layout.
+
+    Built once per payload by `build_usage_table`; every report is then
+    answered from these arrays without touching the JSON dicts again.
+
+    Rows are sorted by date (rows without a usable date first, ordinal -1),
+    so a `--days` window is a suffix found by binary search. Model breakdown
+    items are stored flat, row by row: the items of row i are
+    `item_model[row_start[i]:row_start[i + 1]]` (interned model ids) and the
+    matching `item_cost` (NaN where the cost was not a number).
+    """
+
+    ordinals: array = field(default_factory=lambda: array("l"))
+    dates: List[Optional[str]] = field(default_factory=list)
+    # Per row: index in the original payload (sums run in payload order).
+    positions: array = field(default_factory=lambda: array("l"))
+    presorted: bool = True
+    row_start: array = field(default_factory=lambda: array("l", [0]))
+    item_model: array = field(default_factory=lambda: array("l"))
+    item_cost: array = field(default_factory=lambda: array("d"))
+    # Per row: the model `current` mode reports for it, or -1.
+    row_current: array = field(default_factory=lambda: array("l"))
+    models: List[str] = field(default_factory=list)
+    model_ids: Dict[str, int] = field(default_factory=dict)
+    # Per model id: ascending indexes of the rows it has breakdown items in.
+    model_rows: List[array] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def intern(self, model: str) -> int:
+        model_id = self.model_ids.get(model)
+        if model_id is None:
+            model_id = self.model_ids[model] = len(self.models)
+            self.models.append(model)
+            self.model_rows.append(array("l"))
+        return model_id
+
+    def window(self, days: Optional[int]) -> int:
+        """First row of the last `days` days (0 = every row)."""
+        if not days:
+            return 0
+        return bisect_left(self.ordinals, window_start(days))
+
+    def totals(self, lo: int = 0) -> Dict[str, float]:
+        """Cost per model over rows[lo:], in order of first appearance."""
+        if self.presorted:
+            spans = [(self.row_start[lo], self.row_start[-1])]
+        else:
+            # Add in payload order so totals match a plain pass over the JSON.
+            rows = sorted(range(lo, len(self)), key=self.positions.__getitem__)
+            spans = [(self.row_start[row], self.row_start[row + 1]) for row in rows]
+        sums: Dict[int, float] = {}
+        for start, end in spans:
+            for model_id, cost in zip(islice(self.item_model, start, end), islice(self.item_cost, start, end)):
+                if cost == cost:  # skip NaN (non-numeric cost)
+                    sums[model_id] = sums.get(model_id, 0.0) + cost
+        return {self.models[model_id]: cost for model_id, cost in sums.items()}
+
+    def daily_costs(self, lo: int = 0) -> Dict[date, Dict[str, float]]:
+        """Cost per model per day over dated rows[lo:] (rows sharing a day are summed)."""
+        days: Dict[date, Dict[str, float]] = {}
+        for row in range(max(lo, bisect_left(self.ordinals, 0)), len(self)):
+            models = days.setdefault(date.fromordinal(self.ordinals[row]), {})
+            for item in range(self.row_start[row], self.row_start[row + 1]):
+                cost = self.item_cost[item]
+                if cost == cost:
+                    name = self.models[self.item_model[item]]
+                    models[name] = models.get(name, 0.0) + cost
+        return days
+
+    def current_model(self, lo: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        """Model of the most recent row in rows[lo:] that names one, and its date."""
+        for row in range(len(self) - 1, lo - 1, -1):
+            model_id = self.row_current[row]
+            if model_id >= 0:
+                return self.models[model_id], self.dates[row]
+        return None, None
+
+    def latest_day_cost(self, model: str, lo: int = 0) -> Tuple[Optional[str], Optional[float]]:
+        """Date and cost of the most recent row in rows[lo:] with a breakdown for `model`."""
+        model_id = self.model_ids.get(model)
+        if model_id is None:
+            return None, None
+        rows = self.model_rows[model_id]
+        if not rows or rows[-1] < lo:
+            return None, None
+        row = rows[-1]
+        for item in range(self.row_start[row], self.row_start[row + 1]):
+            if self.item_model[item] == model_id:
+                cost = self.item_cost[item]
+                return self.dates[row], cost if cost == cost else None
+        return self.dates[row], None
+
+
+def _row_breakdown(entry: Dict[str, Any]) -> Tuple[List[Tuple[str, float]], Optional[str]]:
+    """Validated (model, cost) items of a daily entry and its fallback model."""
+    items: List[Tuple[str, float]] = []
+    breakdowns = entry.get("modelBreakdowns")
+    if isinstance(breakdowns, list):
         for item in breakdowns:
             if not isinstance(item, dict):
                 continue
             model = item.get("modelName")
-            cost = item.get("cost")
             if not isinstance(model, str):
                 continue
-            if not isinstance(cost, (int, float)):
-                continue
-            totals[model] = totals.get(model, 0.0) + float(cost)
-    return totals
+            cost = item.get("cost")
+            items.append((model, float(cost) if isinstance(cost, (int, float)) else NAN))
+    models_used = entry.get("modelsUsed")
+    fallback = None
+    if isinstance(models_used, list) and models_used and isinstance(models_used[-1], str):
+        fallback = models_used[-1]
+    return items, fallback
 
 
-def pick_current_model(entries: List[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
-    if not entries:
-        return None, None
-    sorted_entries = sorted(
-        entries,
-        key=lambda entry: entry.get("date") or "",
-    )
-    for entry in reversed(sorted_entries):
-        breakdowns = entry.get("modelBreakdowns")
-        if isinstance(breakdowns, list) and breakdowns:
-            scored: List[ModelCost] = []
-            for item in breakdowns:
-                if not isinstance(item, dict):
+class UsageTableBuilder:
+    """Builds a `UsageTable` one daily entry at a time.
+
+    Entries are reduced to compact columns as they arrive, so the JSON
+    dicts can be dropped immediately (see `stream_tables`). Entries dated
+    before `min_ordinal` are not kept at all.
+    """
+
+    def __init__(self, min_ordinal: int = -1):
+        self.table = UsageTable()
+        self.min_ordinal = min_ordinal
+        self._fallback = array("l")
+        self._position = 0
+        self._sorted = True
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        position = self._position
+        self._position += 1
+        day = entry.get("date")
+        ordinal = date_ordinal(day)
+        if ordinal < self.min_ordinal:
+            return
+        table = self.table
+        if table.ordinals and ordinal < table.ordinals[-1]:
+            self._sorted = False
+        items, fallback = _row_breakdown(entry)
+        for model, cost in items:
+            table.item_model.append(table.intern(model))
+            table.item_cost.append(cost)
+        table.ordinals.append(ordinal)
+        table.positions.append(position)
+        table.dates.append(day if isinstance(day, str) else None)
+        table.row_start.append(len(table.item_model))
+        self._fallback.append(table.intern(fallback) if fallback is not None else -1)
+
+    def finish(self) -> UsageTable:
+        table = self.table
+        fallback = self._fallback
+        if not self._sorted:
+            # Stable date order; ties keep payload order.
+            order = sorted(range(len(table)), key=lambda row: (table.ordinals[row], table.positions[row]))
+            starts, item_model, item_cost = table.row_start, table.item_model, table.item_cost
+            table.ordinals = array("l", (table.ordinals[row] for row in order))
+            table.positions = array("l", (table.positions[row] for row in order))
+            table.dates = [table.dates[row] for row in order]
+            fallback = array("l", (fallback[row] for row in order))
+            table.row_start, table.item_model, table.item_cost = array("l", [0]), array("l"), array("d")
+            for row in order:
+                table.item_model.extend(item_model[starts[row]:starts[row + 1]])
+                table.item_cost.extend(item_cost[starts[row]:starts[row + 1]])
+                table.row_start.append(len(table.item_model))
+            table.presorted = False
+
+        for row in range(len(table)):
+            current, best = -1, -1.0
+            for item in range(table.row_start[row], table.row_start[row + 1]):
+                model_id, cost = table.item_model[item], table.item_cost[item]
+                model_rows = table.model_rows[model_id]
+                if not model_rows or model_rows[-1] != row:
+                    model_rows.append(row)
+                # Highest cost wins; the first listed wins a tie.
+                if cost == cost and (current < 0 or cost > best):
+                    current, best = model_id, cost
+            table.row_current.append(current if current >= 0 else fallback[row])
+        return table
+
+
+def build_usage_table(payload: Dict[str, Any], min_ordinal: int = -1) -> UsageTable:
+    """Normalize a provider payload into a `UsageTable` in one pass."""
+    builder = UsageTableBuilder(min_ordinal)
+    for entry in parse_daily_entries(payload):
+        builder.add(entry)
+    return builder.finish()
+
+
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+class JsonStream:
+    """Pull parser over a text stream, one JSON value at a time.
+
+    Containers are walked with `items()` / `members()`; leaves and small
+    subtrees are decoded whole with `value()` (json's raw_decode on a
+    sliding buffer). Only the value being decoded is ever held in memory.
+    """
+
+    def __init__(self, handle: TextIO, chunk_size: int = 1 << 16):
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        chunk = self.handle.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of input)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Malformed JSON input: expected '{char}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode one complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
                     continue
-                model = item.get("modelName")
-                cost = item.get("cost")
-                if isinstance(model, str) and isinstance(cost, (int, float)):
-                    scored.append(ModelCost(model=model, cost=float(cost)))
-            if scored:
-                scored.sort(key=lambda item: item.cost, reverse=True)
-                return scored[0].model, entry.get("date") if isinstance(entry.get("date"), str) else None
-        models_used = entry.get("modelsUsed")
-        if isinstance(models_used, list) and models_used:
-            last = models_used[-1]
-            if isinstance(last, str):
-                return last, entry.get("date") if isinstance(entry.get("date"), str) else None
-    return None, None
+                raise
+            # A number running up to the buffer end may continue in the next
+            # chunk, including after a tail raw_decode stopped at ("12." of "12.5").
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and not self.eof:
+                tail = end
+                while tail < len(self.buf) and self.buf[tail] in _NUMBER_CHARS:
+                    tail += 1
+                if tail == len(self.buf) and self._fill():
+                    continue
+            self.pos = end
+            return value
+
+    def items(self) -> Iterator[None]:
+        """Walk an array; the caller consumes one element per step."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield None
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError("Malformed JSON input: expected ',' or ']'")
+
+    def members(self) -> Iterator[str]:
+        """Walk an object, yielding keys; the caller consumes each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError("Malformed JSON input: expected ',' or '}'")
+
+
+def _stream_provider(stream: JsonStream, wanted: Optional[str], min_ordinal: int) -> Tuple[Optional[str], Optional[UsageTable]]:
+    """Consume one provider object; returns (provider, table or None if skipped)."""
+    name: Optional[str] = None
+    builder: Optional[UsageTableBuilder] = None
+    for key in stream.members():
+        if key == "provider":
+            name = stream.value()
+        elif key == "daily" and stream.peek() == "[":
+            # Usually "provider" comes first and other providers' rows are
+            # skipped unparsed into the table; if not, they are built and dropped.
+            keep = wanted is None or name is None or name == wanted
+            builder = UsageTableBuilder(min_ordinal) if keep else None
+            for _ in stream.items():
+                if builder is not None and stream.peek() == "{":
+                    builder.add(stream.value())
+                else:
+                    stream.value()
+        else:
+            stream.value()
+    if wanted is not None and name != wanted:
+        return name, None
+    return name, builder.finish() if builder is not None else UsageTable()
+
+
+def stream_tables(
+    handle: TextIO,
+    provider: Optional[str],
+    min_ordinal: int = -1,
+) -> Iterator[Tuple[Optional[str], UsageTable]]:
+    """Stream (provider, table) pairs out of codexbar cost JSON.
+
+    Accepts the codexbar array or a single provider object. With
+    `provider`, only the first matching array element is built and the
+    rest of the input is not read. Rows dated before `min_ordinal` are
+    dropped while parsing.
+    """
+    stream = JsonStream(handle)
+    first = stream.peek()
+    if first == "{":
+        # A single payload is taken as-is, whatever provider it names.
+        name, table = _stream_provider(stream, None, min_ordinal)
+        yield name, table
+        return
+    if first != "[":
+        raise RuntimeError("Unsupported JSON input format.")
+    for _ in stream.items():
+        if stream.peek() != "{":
+            stream.value()
+            continue
+        name, table = _stream_provider(stream, provider, min_ordinal)
+        if table is None:
+            continue
+        if provider is not None or isinstance(name, str):
+            yield name, table
+        if provider is not None:
+            return
+
+
+def window_start(days: Optional[int]) -> int:
+    """Ordinal of the first day in a `--days` window (-1 = no window)."""
+    if not days:
+        return -1
+    return (date.today() - timedelta(days=days - 1)).toordinal()
+
+
+def load_tables(
+    input_path: Optional[str],
+    provider: str,
+    days: Optional[int] = None,
+    max_age: Optional[float] = None,
+    refresh: bool = False,
+) -> List[Tuple[str, UsageTable]]:
+    """(provider, table) for `provider`, or for every provider with "all".
+
+    `--input` files and stdin are streamed; codexbar's own output is small
+    enough to load whole.
+    """
+    if input_path:
+        wanted = None if provider == "all" else provider
+        if input_path == "-":
+            found = list(stream_tables(sys.stdin, wanted, window_start(days)))
+        else:
+            with open(input_path, "r", encoding="utf-8") as handle:
+                found = list(stream_tables(handle, wanted, window_start(days)))
+        if wanted is not None:
+            if not found:
+                raise RuntimeError(f"Provider '{provider}' not found in codexbar payload.")
+            return [(provider, found[0][1])]
+        if not found:
+            raise RuntimeError("No providers found in codexbar payload.")
+        return [(name if isinstance(name, str) else "unknown", table) for name, table in found]
+
+    if provider == "all":
+        payloads = load_all_payloads(max_age=max_age, refresh=refresh)
+        return [(payload.get("provider", "unknown"), build_usage_table(payload)) for payload in payloads]
+    payload = load_payload(provider, max_age=max_age, refresh=refresh)
+    return [(provider, build_usage_table(payload))]
 
 
 def usd(value: Optional[float]) -> str:
@@ -154,27 +605,6 @@ def usd(value: Optional[float]) -> str:
     return f"${value:,.2f}"
 
 
-def latest_day_cost(entries: List[Dict[str, Any]], model: str) -> Tuple[Optional[str], Optional[float]]:
-    if not entries:
-        return None, None
-    sorted_entries = sorted(
-        entries,
-        key=lambda entry: entry.get("date") or "",
-    )
-    for entry in reversed(sorted_entries):
-        breakdowns = entry.get("modelBreakdowns")
-        if not isinstance(breakdowns, list):
-            continue
-        for item in breakdowns:
-            if not isinstance(item, dict):
-                continue
-            if item.get("modelName") == model:
-                cost = item.get("cost") if isinstance(item.get("cost"), (int, float)) else None
-                day = entry.get("date") if isinstance(entry.get("date"), str) else None
-                return day, float(cost) if cost is not None else None
-    return None, None
-
-
 def render_text_current(
     provider: str,
     model: str,
@@ -233,66 +663,376 @@ def build_json_all(provider: str, totals: Dict[str, float]) -> Dict[str, Any]:
     }
 
 
+def summarize_current(table: UsageTable, lo: int, model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Keyword arguments for the `current` renderers, or None without model data."""
+    latest_date = None
+    if not model:
+        model, latest_date = table.current_model(lo)
+    if not model:
+        return None
+    latest_cost_date, latest_cost = table.latest_day_cost(model, lo)
+    return {
+        "model": model,
+        "latest_date": latest_date,
+        "total_cost": table.totals(lo).get(model),
+        "latest_cost": latest_cost,
+        "latest_cost_date": latest_cost_date,
+        "entry_count": len(table) - lo,
+    }
+
+
+def merge_totals(per_provider: List[Dict[str, float]]) -> Dict[str, float]:
+    merged: Dict[str, float] = {}
+    for totals in per_provider:
+        for model, cost in totals.items():
+            merged[model] = merged.get(model, 0.0) + cost
+    return merged
+
+
+def render_text_combined(sections: List[str], totals: Dict[str, float]) -> str:
+    lines = ["\n\n".join(sections), "", "All providers:"]
+    for model, cost in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+        lines.append(f"- {model}: {usd(cost)}")
+    lines.append(f"Total cost (rows): {usd(sum(totals.values()))}")
+    return "\n".join(lines)
+
+
+def build_json_combined(mode: str, reports: List[Dict[str, Any]], totals: Dict[str, float]) -> Dict[str, Any]:
+    return {
+        "provider": "all",
+        "mode": mode,
+        "providers": reports,
+        "models": [
+            {"model": model, "totalCostUSD": cost}
+            for model, cost in sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        ],
+        "totalCostUSD": sum(totals.values()),
+    }
+
+
+def provider_results(
+    tables: List[Tuple[str, UsageTable]],
+    mode: str,
+    days: Optional[int] = None,
+    model: Optional[str] = None,
+) -> List[Tuple[str, Any, Dict[str, float]]]:
+    """(provider, result, window totals) per table, for every report format.
+
+    `result` is the analyze result, the `current` summary or (mode "all")
+    the totals themselves; None when the provider has no model data.
+    """
+    results = []
+    for name, table in tables:
+        lo = table.window(days)
+        totals = table.totals(lo)
+        if mode == "analyze":
+            result = usage_analysis.analyze(table, lo)
+        elif mode == "current":
+            result = summarize_current(table, lo, model)
+        else:
+            result = totals or None
+        results.append((name, result, totals))
+    return results
+
+
+def provider_json(mode: str, provider: str, result: Any, totals: Dict[str, float], combined: bool) -> Dict[str, Any]:
+    if mode == "analyze":
+        return usage_analysis.build_json(provider, result)
+    if mode == "current":
+        return build_json_current(provider=provider, **result)
+    report = build_json_all(provider=provider, totals=totals)
+    if combined:
+        report["totalCostUSD"] = sum(totals.values())
+    return report
+
+
+def provider_text(mode: str, provider: str, result: Any, totals: Dict[str, float]) -> str:
+    """One provider's section of the `--provider all` text report."""
+    if mode == "analyze":
+        if result is None:
+            return f"Provider: {provider}\nNo dated model breakdowns found."
+        return usage_analysis.render_text(provider, result)
+    if mode == "current":
+        if result is None:
+            return f"Provider: {provider}\nNo model data found."
+        return render_text_current(provider=provider, **result)
+    if result is None:
+        return f"Provider: {provider}\nNo model breakdowns found."
+    return f"{render_text_all(provider=provider, totals=totals)}\nTotal: {usd(sum(totals.values()))}"
+
+
+def report_all_providers(args: argparse.Namespace) -> int:
+    """`--provider all`: every provider's report plus cross-provider totals."""
+    try:
+        if args.mode == "analyze":
+            usage_analysis.require_numpy()
+        tables = load_tables(args.input, "all", days=args.days, max_age=args.max_age, refresh=args.refresh)
+    except Exception as exc:
+        eprint(str(exc))
+        return 1
+
+    if args.format == "json":
+        report = build_report(tables, args.mode, "all", days=args.days, model=args.model)
+        if report is None:
+            eprint("No model data found in codexbar cost payload.")
+            return 2
+        indent = 2 if args.pretty else None
+        print(json.dumps(report, indent=indent, sort_keys=args.pretty))
+        return 0
+
+    results = provider_results(tables, args.mode, args.days, args.model)
+    reported = [totals for _, result, totals in results if result is not None]
+    if not reported:
+        eprint("No model data found in codexbar cost payload.")
+        return 2
+    sections = [provider_text(args.mode, name, result, totals) for name, result, totals in results]
+    print(render_text_combined(sections, merge_totals(reported)))
+    return 0
+
+
+def build_report(
+    tables: List[Tuple[str, UsageTable]],
+    mode: str,
+    provider: str,
+    days: Optional[int] = None,
+    model: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """The `--format json` report of one provider (or "all") from loaded tables.
+
+    None when there is no model data to report.
+    """
+    selected = [(name, table) for name, table in tables if provider in ("all", name)]
+    results = [item for item in provider_results(selected, mode, days, model) if item[1] is not None]
+    if not results:
+        return None
+    reports = [provider_json(mode, name, result, totals, provider == "all") for name, result, totals in results]
+    if provider != "all":
+        return reports[0]
+    return build_json_combined(mode, reports, merge_totals([totals for _, _, totals in results]))
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    """`serve`: answer report queries over loopback HTTP from memory."""
+    if args.input:
+        if args.input == "-":
+            eprint("serve needs --input to be a file, not stdin.")
+            return 1
+
+        def fingerprint() -> Any:
+            try:
+                st = os.stat(args.input)
+            except OSError:
+                return None
+            return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+    else:
+
+        def fingerprint() -> Any:
+            return log_fingerprint("all")
+
+    refresh = [args.refresh]
+
+    def load() -> List[Tuple[str, UsageTable]]:
+        # codexbar's own on-disk cache still applies; --refresh only forces the first run.
+        tables = load_tables(args.input, "all", days=None, max_age=args.max_age, refresh=refresh[0])
+        refresh[0] = False
+        return tables
+
+    try:
+        usage_server.serve(usage_server.UsageCache(load, fingerprint), build_report, args.http, args.interval)
+    except Exception as exc:
+        eprint(str(exc))
+        return 1
+    return 0
+
+
+def render_text_ledger(group_by: str, rows: List[Tuple[str, str, str, float]]) -> str:
+    if not rows:
+        return "No ledger rows in range."
+    lines: List[str] = []
+    period_total = 0.0
+    for index, (start, provider, model, cost) in enumerate(rows):
+        if index == 0 or start != rows[index - 1][0]:
+            lines.append(f"{group_by.capitalize()} of {start}:")
+            period_total = 0.0
+        lines.append(f"- {provider} {model}: {usd(cost)}")
+        period_total += cost
+        if index == len(rows) - 1 or rows[index + 1][0] != start:
+            lines.append(f"  Total: {usd(period_total)}")
+    lines.append(f"Total cost: {usd(sum(row[3] for row in rows))}")
+    return "\n".join(lines)
+
+
+def build_json_ledger(
+    group_by: str,
+    since: Optional[str],
+    until: Optional[str],
+    rows: List[Tuple[str, str, str, float]],
+) -> Dict[str, Any]:
+    return {
+        "mode": "ledger",
+        "groupBy": group_by,
+        "since": since,
+        "until": until,
+        "rows": [
+            {"period": start, "provider": provider, "model": model, "costUSD": cost}
+            for start, provider, model, cost in rows
+        ],
+        "totalCostUSD": sum(row[3] for row in rows),
+    }
+
+
+def run_ingest(args: argparse.Namespace) -> int:
+    """`ingest`: fold the current codexbar data (or --input) into the ledger."""
+    try:
+        tables = load_tables(args.input, args.provider, days=args.days, max_age=args.max_age, refresh=args.refresh)
+        conn = usage_ledger.connect(args.ledger)
+    except Exception as exc:
+        eprint(str(exc))
+        return 1
+    with conn:
+        for provider, table in tables:
+            days = table.daily_costs(table.window(args.days))
+            written = usage_ledger.ingest(conn, provider, days)
+            print(f"{provider}: {len(days)} day(s), {written} model row(s) ingested")
+    conn.close()
+    return 0
+
+
+def run_query(args: argparse.Namespace) -> int:
+    """`query`: spend from the ledger, grouped by day, week or month."""
+    since = parse_date(args.since) if args.since else None
+    until = parse_date(args.until) if args.until else None
+    if (args.since and since is None) or (args.until and until is None):
+        eprint("--since/--until must be YYYY-MM-DD dates.")
+        return 1
+    if args.days and not since:
+        since = date.fromordinal(window_start(args.days))
+    providers = None if args.provider == "all" else [args.provider]
+    try:
+        conn = usage_ledger.connect(args.ledger)
+        rows = usage_ledger.query(conn, args.group_by, since=since, until=until, providers=providers)
+        conn.close()
+    except Exception as exc:
+        eprint(str(exc))
+        return 1
+
+    if args.format == "json":
+        indent = 2 if args.pretty else None
+        payload_out = build_json_ledger(
+            args.group_by, since.isoformat() if since else None, until.isoformat() if until else None, rows
+        )
+        print(json.dumps(payload_out, indent=indent, sort_keys=args.pretty))
+    else:
+        print(render_text_ledger(args.group_by, rows))
+    return 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Summarize CodexBar model usage from local cost logs.")
-    parser.add_argument("--provider", choices=["codex", "claude"], default="codex")
-    parser.add_argument("--mode", choices=["current", "all"], default="current")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["report", "ingest", "query", "serve"],
+        default="report",
+        help=(
+            "report (default) summarizes codexbar data; ingest stores it in the ledger; query reads the ledger; "
+            "serve answers reports over loopback HTTP."
+        ),
+    )
+    parser.add_argument(
+        "--provider",
+        choices=PROVIDERS + ["all"],
+        default="codex",
+        help="Provider to report; 'all' reports every provider from one codexbar run.",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["current", "all", "analyze"],
+        default="current",
+        help="analyze: rolling sums, monthly share, month-end forecast and spikes (needs NumPy).",
+    )
     parser.add_argument("--model", help="Explicit model name to report instead of auto-current.")
     parser.add_argument("--input", help="Path to codexbar cost JSON (or '-' for stdin).")
     parser.add_argument("--days", type=int, help="Limit to last N days (based on daily rows).")
     parser.add_argument("--format", choices=["text", "json"], default="text")
     parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON output.")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached codexbar output and re-run it.")
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        metavar="SECONDS",
+        help="Reuse cached codexbar output younger than this instead of checking its logs for changes.",
+    )
+    parser.add_argument("--ledger", help=f"Ledger database (default: {usage_ledger.default_ledger_path()}).")
+    parser.add_argument("--since", help="query: first day (YYYY-MM-DD).")
+    parser.add_argument("--until", help="query: last day (YYYY-MM-DD).")
+    parser.add_argument("--group-by", choices=usage_ledger.PERIODS, default="month", help="query: grouping.")
+    parser.add_argument(
+        "--http",
+        metavar="HOST:PORT",
+        default=usage_server.DEFAULT_ADDRESS,
+        help=f"serve: address to listen on (default: {usage_server.DEFAULT_ADDRESS}).",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        metavar="SECONDS",
+        default=usage_server.DEFAULT_INTERVAL,
+        help="serve: how often to check codexbar's logs for new data.",
+    )
 
     args = parser.parse_args()
 
+    if args.command == "ingest":
+        return run_ingest(args)
+    if args.command == "query":
+        return run_query(args)
+    if args.command == "serve":
+        return run_serve(args)
+
+    if args.provider == "all":
+        return report_all_providers(args)
+
     try:
-        payload = load_payload(args.input, args.provider)
+        if args.mode == "analyze":
+            usage_analysis.require_numpy()
+        [(_, table)] = load_tables(
+            args.input, args.provider, days=args.days, max_age=args.max_age, refresh=args.refresh
+        )
     except Exception as exc:
         eprint(str(exc))
         return 1
 
-    entries = parse_daily_entries(payload)
-    entries = filter_by_days(entries, args.days)
+    lo = table.window(args.days)
+
+    if args.mode == "analyze":
+        result = usage_analysis.analyze(table, lo)
+        if result is None:
+            eprint("No dated model breakdowns found in codexbar cost payload.")
+            return 2
+        if args.format == "json":
+            indent = 2 if args.pretty else None
+            print(json.dumps(usage_analysis.build_json(args.provider, result), indent=indent, sort_keys=args.pretty))
+        else:
+            print(usage_analysis.render_text(args.provider, result))
+        return 0
 
     if args.mode == "current":
-        model = args.model
-        latest_date = None
-        if not model:
-            model, latest_date = pick_current_model(entries)
-        if not model:
+        summary = summarize_current(table, lo, args.model)
+        if summary is None:
             eprint("No model data found in codexbar cost payload.")
             return 2
-        totals = aggregate_costs(entries)
-        total_cost = totals.get(model)
-        latest_cost_date, latest_cost = latest_day_cost(entries, model)
 
         if args.format == "json":
-            payload_out = build_json_current(
-                provider=args.provider,
-                model=model,
-                latest_date=latest_date,
-                total_cost=total_cost,
-                latest_cost=latest_cost,
-                latest_cost_date=latest_cost_date,
-                entry_count=len(entries),
-            )
+            payload_out = build_json_current(provider=args.provider, **summary)
             indent = 2 if args.pretty else None
             print(json.dumps(payload_out, indent=indent, sort_keys=args.pretty))
         else:
-            print(
-                render_text_current(
-                    provider=args.provider,
-                    model=model,
-                    latest_date=latest_date,
-                    total_cost=total_cost,
-                    latest_cost=latest_cost,
-                    latest_cost_date=latest_cost_date,
-                    entry_count=len(entries),
-                )
-            )
+            print(render_text_current(provider=args.provider, **summary))
         return 0
 
-    totals = aggregate_costs(entries)
+    totals = table.totals(lo)
     if not totals:
         eprint("No model breakdowns found in codexbar cost payload.")
         return 2
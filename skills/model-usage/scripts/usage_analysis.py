@@ -0,0 +1,243 @@
+"""
+Cost time-series analytics for `model_usage.py --mode analyze`.
+
+Builds a dense days x models cost matrix from a `UsageTable` and derives
+rolling sums, per-model share by month, a month-end forecast and spike
+days from it with NumPy array operations. NumPy is optional: every other
+mode works without it.
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # analyze mode only
+    np = None
+
+if TYPE_CHECKING:
+    from model_usage import UsageTable
+
+ROLLING_WINDOWS = (7, 30)
+# Days of history the month-end linear fit is based on.
+FORECAST_FIT_DAYS = 30
+# A day is a spike when its total is this many standard deviations above
+# the SPIKE_WINDOW days before it (and at least SPIKE_MIN_HISTORY exist).
+SPIKE_Z = 3.0
+SPIKE_WINDOW = 30
+SPIKE_MIN_HISTORY = 7
+
+# date(1970, 1, 1).toordinal(): ordinals to datetime64[D].
+_EPOCH_ORDINAL = 719163
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("--mode analyze needs NumPy (pip install numpy).")
+
+
+def cost_matrix(table: UsageTable, lo: int = 0):
+    """(first ordinal, dense costs[day, model]) over dated rows[lo:].
+
+    One row per calendar day from the first to the last dated row, zero
+    on days without data; rows sharing a day are summed and NaN costs are
+    dropped. Columns follow `table.models`. None without dated rows or models.
+    """
+    require_numpy()
+    ordinals = np.frombuffer(table.ordinals, dtype=f"i{table.ordinals.itemsize}")
+    row_start = np.frombuffer(table.row_start, dtype=f"i{table.row_start.itemsize}")
+    lo = max(lo, int(np.searchsorted(ordinals, 0)))
+    if lo >= len(ordinals) or not table.models:
+        return None
+    first, last = int(ordinals[lo]), int(ordinals[-1])
+
+    start, end = int(row_start[lo]), int(row_start[-1])
+    item_row = np.repeat(np.arange(lo, len(ordinals)), np.diff(row_start[lo:]))
+    item_model = np.frombuffer(table.item_model, dtype=f"i{table.item_model.itemsize}")[start:end]
+    item_cost = np.frombuffer(table.item_cost, dtype=np.float64)[start:end]
+    keep = ~np.isnan(item_cost)
+
+    width = len(table.models)
+    cells = (ordinals[item_row[keep]] - first) * width + item_model[keep]
+    flat = np.bincount(cells, weights=item_cost[keep], minlength=(last - first + 1) * width)
+    return first, flat.reshape(last - first + 1, width)
+
+
+def rolling_sums(matrix, window: int):
+    """Sum of the `window` days ending on each day (fewer at the start)."""
+    cumulative = np.vstack([np.zeros((1,) + matrix.shape[1:]), np.cumsum(matrix, axis=0)])
+    ends = np.arange(1, len(matrix) + 1)
+    return cumulative[ends] - cumulative[np.maximum(ends - window, 0)]
+
+
+def monthly_share(first: int, matrix):
+    """(month starts, monthly costs[month, model], share[month, model])."""
+    days = (np.arange(len(matrix)) + (first - _EPOCH_ORDINAL)).astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    boundaries = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    costs = np.add.reduceat(matrix, boundaries, axis=0)
+    totals = costs.sum(axis=1, keepdims=True)
+    share = np.divide(costs, totals, out=np.zeros_like(costs), where=totals > 0)
+    return months[boundaries], costs, share
+
+
+def month_end_forecast(first: int, matrix):
+    """(month start, spent so far[model], forecast[model]) for the last day's month.
+
+    Fits a line to each model's daily cost over the last FORECAST_FIT_DAYS
+    days and adds its projection (never below zero) for the rest of the
+    month to what the month has cost so far.
+    """
+    last_day = date.fromordinal(first + len(matrix) - 1)
+    month_start = last_day.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    spent = matrix[max(month_start.toordinal() - first, 0):].sum(axis=0)
+    remaining = (month_end - last_day).days
+    if remaining == 0:
+        return month_start, spent, spent
+
+    history = matrix[-FORECAST_FIT_DAYS:]
+    x = np.arange(len(history), dtype=np.float64)
+    future = np.arange(len(history), len(history) + remaining, dtype=np.float64)
+    if len(history) < 2:
+        projected = np.repeat(history, remaining, axis=0)
+    else:
+        slope, intercept = np.polyfit(x, history, 1)
+        projected = np.outer(future, slope) + intercept
+    return month_start, spent, spent + np.clip(projected, 0.0, None).sum(axis=0)
+
+
+def spikes(matrix):
+    """(day indexes, z-scores) of days whose total spikes above the days before."""
+    daily = matrix.sum(axis=1)
+    cumulative = np.r_[0.0, np.cumsum(daily)]
+    squares = np.r_[0.0, np.cumsum(daily * daily)]
+    days = np.arange(len(daily))
+    begin = np.maximum(days - SPIKE_WINDOW, 0)
+    count = days - begin
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (cumulative[days] - cumulative[begin]) / count
+        variance = (squares[days] - squares[begin]) / count - mean * mean
+        z = (daily - mean) / np.sqrt(np.maximum(variance, 0.0))
+    flagged = (count >= SPIKE_MIN_HISTORY) & (variance > 1e-12) & (z >= SPIKE_Z)
+    indexes = np.flatnonzero(flagged)
+    return indexes, z[indexes]
+
+
+def analyze(table: UsageTable, lo: int = 0) -> Optional[Dict[str, Any]]:
+    """Every analytics view of rows[lo:], as plain Python values (None without data)."""
+    built = cost_matrix(table, lo)
+    if built is None:
+        return None
+    first, matrix = built
+    models = table.models
+    rolling = {window: rolling_sums(matrix, window) for window in ROLLING_WINDOWS}
+    months, month_costs, shares = monthly_share(first, matrix)
+    month_start, spent, forecast = month_end_forecast(first, matrix)
+    spike_days, spike_z = spikes(matrix)
+    last30 = rolling[30][-1]
+    share30 = last30 / last30.sum() if last30.sum() > 0 else np.zeros_like(last30)
+
+    order = np.argsort(-last30, kind="stable")
+    return {
+        "first_date": date.fromordinal(first).isoformat(),
+        "last_date": date.fromordinal(first + len(matrix) - 1).isoformat(),
+        "day_count": len(matrix),
+        "rolling": {window: float(sums[-1].sum()) for window, sums in rolling.items()},
+        "month": month_start.isoformat()[:7],
+        "month_to_date": float(spent.sum()),
+        "month_forecast": float(forecast.sum()),
+        "models": [
+            {
+                "model": models[index],
+                "rolling": {window: float(sums[-1, index]) for window, sums in rolling.items()},
+                "share30": float(share30[index]),
+                "month_forecast": float(forecast[index]),
+            }
+            for index in order
+            if matrix[:, index].any()
+        ],
+        "monthly": [
+            {
+                "month": str(month),
+                "cost": float(month_costs[row].sum()),
+                "shares": {models[index]: float(shares[row, index]) for index in np.flatnonzero(month_costs[row])},
+            }
+            for row, month in enumerate(months)
+        ],
+        "spikes": [
+            {
+                "date": date.fromordinal(first + int(day)).isoformat(),
+                "cost": float(matrix[day].sum()),
+                "z": float(z),
+                "top_model": models[int(np.argmax(matrix[day]))],
+            }
+            for day, z in zip(spike_days, spike_z)
+        ],
+    }
+
+
+def _usd(value: float) -> str:
+    return f"${value:,.2f}"
+
+
+def render_text(provider: str, result: Dict[str, Any]) -> str:
+    lines = [
+        f"Provider: {provider}",
+        f"Days: {result['first_date']} .. {result['last_date']} ({result['day_count']})",
+    ]
+    for window, cost in result["rolling"].items():
+        lines.append(f"Last {window} days: {_usd(cost)}")
+    lines.append(
+        f"{result['month']}: {_usd(result['month_to_date'])} so far, "
+        f"forecast {_usd(result['month_forecast'])} by month end"
+    )
+    lines.append("Models (last 30 days):")
+    for model in result["models"]:
+        lines.append(
+            f"- {model['model']}: {_usd(model['rolling'][30])} ({model['share30']:.0%}), "
+            f"forecast {_usd(model['month_forecast'])}"
+        )
+    lines.append("Monthly share:")
+    for month in result["monthly"][-6:]:
+        top = sorted(month["shares"].items(), key=lambda item: item[1], reverse=True)[:3]
+        shares = ", ".join(f"{model} {share:.0%}" for model, share in top)
+        lines.append(f"- {month['month']}: {_usd(month['cost'])} ({shares})")
+    if result["spikes"]:
+        lines.append(f"Spikes (z >= {SPIKE_Z:g} vs the previous {SPIKE_WINDOW} days):")
+        for spike in result["spikes"][-10:]:
+            lines.append(f"- {spike['date']}: {_usd(spike['cost'])} (z {spike['z']:.1f}, mostly {spike['top_model']})")
+    return "\n".join(lines)
+
+
+def build_json(provider: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "provider": provider,
+        "mode": "analyze",
+        "firstDate": result["first_date"],
+        "lastDate": result["last_date"],
+        "dayCount": result["day_count"],
+        **{f"last{window}DaysCostUSD": cost for window, cost in result["rolling"].items()},
+        "month": result["month"],
+        "monthToDateCostUSD": result["month_to_date"],
+        "monthEndForecastUSD": result["month_forecast"],
+        "models": [
+            {
+                "model": model["model"],
+                **{f"last{window}DaysCostUSD": cost for window, cost in model["rolling"].items()},
+                "share30Days": model["share30"],
+                "monthEndForecastUSD": model["month_forecast"],
+            }
+            for model in result["models"]
+        ],
+        "monthly": [
+            {"month": month["month"], "totalCostUSD": month["cost"], "share": month["shares"]}
+            for month in result["monthly"]
+        ],
+        "spikes": [
+            {"date": spike["date"], "costUSD": spike["cost"], "zScore": spike["z"], "topModel": spike["top_model"]}
+            for spike in result["spikes"]
+        ],
+    }
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Benchmark model_usage.py on synthetic codexbar cost payloads.
+
+Generates realistic `codexbar cost` output (providers x days x models, with
+`modelBreakdowns`, `modelsUsed` and token fields) at increasing sizes and
+times each stage of a report: JSON parsing, streaming input, building the
+usage table, totals, current model, `--days` windows, rendering and
+(with NumPy) analyze. Prints JSON so runs can be diffed or kept as a
+baseline:
+
+    python usage_bench.py --days 30,365,3650 --pretty > bench.json
+    python usage_bench.py --baseline bench.json   # exit 1 on regressions
+    python usage_bench.py --emit --days 3650 > cost.json   # payload only
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import model_usage
+import usage_analysis
+
+DEFAULT_DAYS = "30,365,3650"
+DEFAULT_MODELS = 8
+DEFAULT_PROVIDERS = 2
+DEFAULT_REPEAT = 5
+# --baseline flags a stage as regressed when it is this much slower.
+DEFAULT_TOLERANCE = 1.25
+# Stages faster than this (ms) are too noisy to compare.
+MIN_COMPARE_MS = 0.5
+
+MODEL_FAMILIES = {
+    "codex": ["gpt-5", "gpt-5-codex", "gpt-5-mini", "o3", "o4-mini", "gpt-4.1", "gpt-4.1-mini", "codex-mini"],
+    "claude": ["claude-opus-4", "claude-sonnet-4", "claude-3-7-sonnet", "claude-3-5-haiku"],
+}
+
+
+def provider_names(count: int) -> List[str]:
+    names = list(model_usage.PROVIDERS)
+    return (names + [f"provider{index}" for index in range(len(names), count)])[:count]
+
+
+def model_names(provider: str, count: int) -> List[str]:
+    family = MODEL_FAMILIES.get(provider, [])
+    return (family + [f"{provider}-model-{index}" for index in range(len(family), count)])[:count]
+
+
+def generate_provider(provider: str, days: int, models: int, rng: random.Random, end: date) -> Dict[str, Any]:
+    """One provider's payload: `days` daily rows ending at `end`.
+
+    Each day uses a random subset of the provider's models (a few favourites
+    most days), with skewed costs, token counts and an occasional missing
+    day, roughly like real logs.
+    """
+    names = model_names(provider, models)
+    weights = [1.0 / (rank + 1) for rank in range(len(names))]
+    daily = []
+    total_cost = 0.0
+    for offset in range(days - 1, -1, -1):
+        if rng.random() < 0.05:
+            continue
+        used = sorted(set(rng.choices(names, weights=weights, k=rng.randint(1, min(4, len(names))))), key=names.index)
+        breakdowns = [{"modelName": name, "cost": round(rng.lognormvariate(0, 1.2), 4)} for name in used]
+        input_tokens = rng.randint(10_000, 2_000_000)
+        output_tokens = input_tokens // rng.randint(5, 40)
+        cache_read = input_tokens * rng.randint(0, 8)
+        cost = sum(item["cost"] for item in breakdowns)
+        total_cost += cost
+        daily.append(
+            {
+                "date": (end - timedelta(days=offset)).isoformat(),
+                "inputTokens": input_tokens,
+                "outputTokens": output_tokens,
+                "cacheReadTokens": cache_read,
+                "cacheCreationTokens": 0,
+                "totalTokens": input_tokens + output_tokens + cache_read,
+                "totalCost": round(cost, 4),
+                "modelsUsed": used,
+                "modelBreakdowns": breakdowns,
+            }
+        )
+    return {
+        "provider": provider,
+        "source": "local",
+        "updatedAt": f"{end.isoformat()}T12:00:00Z",
+        "daily": daily,
+        "totals": {"totalCost": round(total_cost, 4)},
+    }
+
+
+def generate_payload(providers: int, days: int, models: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """A `codexbar cost --format json` payload (one entry per provider)."""
+    rng = random.Random(seed)
+    end = date.today()
+    return [generate_provider(name, days, models, rng, end) for name in provider_names(providers)]
+
+
+def time_stage(run: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"medianMs": round(statistics.median(timings), 3), "minMs": round(min(timings), 3)}
+
+
+def bench_size(providers: int, days: int, models: int, repeat: int, seed: int) -> Dict[str, Any]:
+    payload = generate_payload(providers, days, models, seed)
+    raw = json.dumps(payload)
+    tables = [(entry["provider"], model_usage.build_usage_table(entry)) for entry in payload]
+    first = payload[0]
+    table = tables[0][1]
+    totals = table.totals()
+    summary = model_usage.summarize_current(table, 0)
+
+    stages: Dict[str, Callable[[], Any]] = {
+        "parse_json": lambda: json.loads(raw),
+        "stream_input": lambda: list(model_usage.stream_tables(io.StringIO(raw), None)),
+        "stream_input_days30": lambda: list(
+            model_usage.stream_tables(io.StringIO(raw), None, model_usage.window_start(30))
+        ),
+        "build_table": lambda: model_usage.build_usage_table(first),
+        "totals": lambda: table.totals(),
+        "totals_days30": lambda: table.totals(table.window(30)),
+        "current_model": lambda: model_usage.summarize_current(table, 0),
+        "render_text_all": lambda: model_usage.render_text_all(first["provider"], totals),
+        "render_text_current": lambda: model_usage.render_text_current(provider=first["provider"], **summary),
+        "render_json_all": lambda: json.dumps(model_usage.build_json_all(first["provider"], totals)),
+        "report_all_providers": lambda: json.dumps(model_usage.build_report(tables, "all", "all")),
+    }
+    if usage_analysis.np is not None:
+        stages["analyze"] = lambda: usage_analysis.analyze(table)
+
+    return {
+        "providers": providers,
+        "days": days,
+        "models": models,
+        "payloadBytes": len(raw),
+        "stages": {name: time_stage(run, repeat) for name, run in stages.items()},
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Stages slower than `tolerance` times their baseline median, at matching sizes."""
+    previous = {(size["providers"], size["days"], size["models"]): size["stages"] for size in baseline.get("sizes", [])}
+    regressions = []
+    for size in results["sizes"]:
+        old_stages = previous.get((size["providers"], size["days"], size["models"]))
+        if not old_stages:
+            continue
+        for name, timing in size["stages"].items():
+            old = old_stages.get(name)
+            if not old or max(old["medianMs"], timing["medianMs"]) < MIN_COMPARE_MS:
+                continue
+            if timing["medianMs"] > old["medianMs"] * tolerance:
+                regressions.append(
+                    f"{name} at {size['providers']}x{size['days']}x{size['models']}: "
+                    f"{old['medianMs']:.3f} ms -> {timing['medianMs']:.3f} ms"
+                )
+    return regressions
+
+
+def parse_sizes(raw: str) -> List[int]:
+    try:
+        sizes = [int(item) for item in raw.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated day counts, got '{raw}'")
+    if not sizes or min(sizes) <= 0:
+        raise argparse.ArgumentTypeError("day counts must be positive")
+    return sizes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark model_usage.py on synthetic codexbar payloads.")
+    parser.add_argument("--days", type=parse_sizes, default=parse_sizes(DEFAULT_DAYS), help="Comma-separated day counts.")
+    parser.add_argument("--models", type=int, default=DEFAULT_MODELS, help="Models per provider.")
+    parser.add_argument("--providers", type=int, default=DEFAULT_PROVIDERS, help="Providers per payload.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per stage (median reported).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON output.")
+    parser.add_argument("--baseline", help="Earlier results to compare with; exit 1 on regressions.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown vs --baseline.")
+    parser.add_argument("--emit", action="store_true", help="Print a generated payload (largest --days) and exit.")
+    args = parser.parse_args(argv)
+
+    if args.emit:
+        payload = generate_payload(args.providers, max(args.days), args.models, args.seed)
+        print(json.dumps(payload, indent=2 if args.pretty else None))
+        return 0
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": getattr(usage_analysis.np, "__version__", None),
+        "repeat": args.repeat,
+        "sizes": [bench_size(args.providers, days, args.models, args.repeat, args.seed) for days in args.days],
+    }
+    print(json.dumps(results, indent=2 if args.pretty else None))
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        for line in regressions:
+            model_usage.eprint(f"Regression: {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,152 @@
+"""
+SQLite ledger of daily per-model cost, for history beyond codexbar's window.
+
+`model_usage.py ingest` folds codexbar payloads into the ledger and
+`model_usage.py query` reads it back by day, week or month.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import sys
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PERIODS = ("day", "week", "month")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily (
+    provider TEXT NOT NULL,
+    day TEXT NOT NULL,
+    model TEXT NOT NULL,
+    cost REAL NOT NULL,
+    PRIMARY KEY (provider, day, model)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS daily_day ON daily (day);
+
+-- Precomputed sums per week (starting Monday) and per calendar month.
+CREATE TABLE IF NOT EXISTS rollup (
+    period TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    start TEXT NOT NULL,
+    model TEXT NOT NULL,
+    cost REAL NOT NULL,
+    PRIMARY KEY (period, provider, start, model)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rollup_start ON rollup (period, start);
+"""
+
+
+def default_ledger_path() -> str:
+    if sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, "model-usage", "ledger.sqlite3")
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """Open (creating if needed) the ledger database."""
+    path = path or default_ledger_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def period_end(day: date, period: str) -> date:
+    """Last day of the period containing `day`."""
+    if period == "week":
+        return period_start(day, "week") + timedelta(days=6)
+    if period == "month":
+        next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return next_month - timedelta(days=1)
+    return day
+
+
+def ingest(
+    conn: sqlite3.Connection,
+    provider: str,
+    days: Dict[date, Dict[str, float]],
+) -> int:
+    """Store per-model cost for each day, replacing what the ledger had.
+
+    Ingesting the same data again leaves the ledger unchanged; a day that
+    grew since the last ingest (today, typically) is simply overwritten.
+    Rollups of every touched week and month are rebuilt in the same
+    transaction. Returns the number of (day, model) rows written.
+    """
+    written = 0
+    touched = {(period, period_start(day, period)) for day in days for period in ("week", "month")}
+    with conn:
+        for day, models in days.items():
+            conn.execute("DELETE FROM daily WHERE provider = ? AND day = ?", (provider, day.isoformat()))
+            conn.executemany(
+                "INSERT INTO daily (provider, day, model, cost) VALUES (?, ?, ?, ?)",
+                [(provider, day.isoformat(), model, cost) for model, cost in models.items()],
+            )
+            written += len(models)
+        for period, start in touched:
+            conn.execute(
+                "DELETE FROM rollup WHERE period = ? AND provider = ? AND start = ?",
+                (period, provider, start.isoformat()),
+            )
+            conn.execute(
+                "INSERT INTO rollup (period, provider, start, model, cost)"
+                " SELECT ?, provider, ?, model, SUM(cost) FROM daily"
+                " WHERE provider = ? AND day BETWEEN ? AND ? GROUP BY model",
+                (period, start.isoformat(), provider, start.isoformat(), period_end(start, period).isoformat()),
+            )
+    return written
+
+
+def query(
+    conn: sqlite3.Connection,
+    group_by: str,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    providers: Optional[Iterable[str]] = None,
+) -> List[Tuple[str, str, str, float]]:
+    """(period start, provider, model, cost) rows, oldest period first.
+
+    Week and month groups always cover whole periods: `since` and `until`
+    are widened to the enclosing period boundaries.
+    """
+    if group_by not in PERIODS:
+        raise ValueError(f"Unknown grouping '{group_by}'")
+    clauses: List[str] = []
+    params: List[object] = []
+    if group_by == "day":
+        sql = "SELECT day, provider, model, cost FROM daily"
+        column = "day"
+    else:
+        sql = "SELECT start, provider, model, cost FROM rollup"
+        column = "start"
+        clauses.append("period = ?")
+        params.append(group_by)
+    if since:
+        clauses.append(f"{column} >= ?")
+        params.append(period_start(since, group_by).isoformat())
+    if until:
+        clauses.append(f"{column} <= ?")
+        params.append(until.isoformat())
+    if providers is not None:
+        names = list(providers)
+        clauses.append(f"provider IN ({', '.join('?' for _ in names)})")
+        params.extend(names)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {column}, provider, cost DESC, model"
+    return [(row[0], row[1], row[2], float(row[3])) for row in conn.execute(sql, params)]
@@ -0,0 +1,187 @@
+"""
+Loopback HTTP server for `model_usage.py serve`.
+
+A menu-bar widget or agent polling `model_usage.py` every minute spawns
+Python and codexbar each time, for answers that rarely change. `serve`
+keeps the parsed tables in memory, answers the same JSON reports as
+`--format json` over HTTP, and reloads in the background only when
+codexbar's logs (or the --input file) change:
+
+    curl 'http://127.0.0.1:8787/current?provider=codex'
+    curl 'http://127.0.0.1:8787/all?provider=all&days=30'
+    curl 'http://127.0.0.1:8787/analyze?provider=claude'
+    curl 'http://127.0.0.1:8787/ping'
+
+Answers are memoized per query until the next reload.
+"""
+
+from __future__ import annotations
+
+import json
+import signal
+import sys
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_ADDRESS = "127.0.0.1:8787"
+# Seconds between checks for changed data.
+DEFAULT_INTERVAL = 60.0
+# Without a fingerprint (no local logs found) data is reloaded this often.
+DEFAULT_TTL = 300.0
+
+MODES = ("current", "all", "analyze")
+
+
+class UsageCache:
+    """Parsed usage tables plus memoized reports, reloaded when the data changes.
+
+    `load` returns [(provider, UsageTable)]; `fingerprint` returns a value
+    that changes whenever the underlying data does (None when unknown, in
+    which case the tables are reloaded every DEFAULT_TTL seconds).
+    """
+
+    def __init__(self, load: Callable[[], List[Tuple[str, Any]]], fingerprint: Callable[[], Any]):
+        self._load = load
+        self._fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self.tables: List[Tuple[str, Any]] = []
+        self.stamp: Any = None
+        self.loaded_at = 0.0
+        self.error: Optional[str] = None
+        self._answers: Dict[Tuple[Any, ...], Optional[Dict[str, Any]]] = {}
+
+    def reload(self) -> None:
+        stamp = self._fingerprint()
+        tables = self._load()
+        with self._lock:
+            self.tables, self.stamp, self.loaded_at = tables, stamp, time.time()
+            self.error = None
+            self._answers = {}
+
+    def refresh_if_changed(self) -> bool:
+        """Reload if the data changed since the last load. True if it reloaded."""
+        stamp = self._fingerprint()
+        if stamp is not None and stamp == self.stamp:
+            return False
+        if stamp is None and time.time() - self.loaded_at < DEFAULT_TTL:
+            return False
+        try:
+            self.reload()
+        except Exception as exc:
+            # Keep answering from the last good data.
+            self.error = str(exc)
+            print(f"model-usage: reload failed: {exc}", file=sys.stderr)
+            return False
+        return True
+
+    def answer(self, key: Tuple[Any, ...], build: Callable[[List[Tuple[str, Any]]], Optional[Dict[str, Any]]]):
+        with self._lock:
+            tables, answers = self.tables, self._answers
+            if key in answers:
+                return answers[key]
+        result = build(tables)
+        with self._lock:
+            if answers is self._answers:
+                answers[key] = result
+        return result
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def handle(cache: UsageCache, report: Callable[..., Optional[Dict[str, Any]]], command: str, params: dict) -> dict:
+    """Answer one request; raises RequestError for bad or unanswerable ones."""
+    if command == "ping":
+        return {
+            "ok": True,
+            "providers": [provider for provider, _ in cache.tables],
+            "loadedAt": cache.loaded_at,
+            "error": cache.error,
+        }
+    if command not in MODES:
+        raise RequestError(404, f"unknown command: {command}")
+
+    provider = params.get("provider", "codex")
+    if provider != "all" and provider not in {name for name, _ in cache.tables}:
+        raise RequestError(404, f"Provider '{provider}' not found in codexbar payload.")
+    try:
+        days = int(params["days"]) if params.get("days") else None
+    except ValueError:
+        raise RequestError(400, "days must be an integer")
+    model = params.get("model") or None
+
+    # `days` windows are relative to today, so a new day is a new answer.
+    key = (command, provider, days, model, date.today())
+    try:
+        result = cache.answer(key, lambda tables: report(tables, command, provider, days=days, model=model))
+    except RuntimeError as exc:
+        raise RequestError(503, str(exc))
+    if result is None:
+        raise RequestError(404, "No model data found in codexbar cost payload.")
+    return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "model-usage"
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            self._reply(200, handle(self.server.cache, self.server.report, url.path.strip("/"), params))
+        except RequestError as exc:
+            self._reply(exc.status, {"error": str(exc)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _TCPHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def _watch(cache: UsageCache, interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        cache.refresh_if_changed()
+
+
+def serve(
+    cache: UsageCache,
+    report: Callable[..., Optional[Dict[str, Any]]],
+    address: str = DEFAULT_ADDRESS,
+    interval: float = DEFAULT_INTERVAL,
+) -> None:
+    """Serve usage reports until interrupted."""
+    cache.reload()
+    host, _, port = address.rpartition(":")
+    server = _TCPHTTPServer((host or "127.0.0.1", int(port)), _Handler)
+    server.cache = cache
+    server.report = report
+
+    stop = threading.Event()
+    threading.Thread(target=_watch, args=(cache, interval, stop), daemon=True).start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"model-usage serving on http://{host or '127.0.0.1'}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
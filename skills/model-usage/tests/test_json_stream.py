@@ -0,0 +1,107 @@
+"""JsonStream must decode exactly what json.loads does, however the input is chunked."""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import model_usage  # noqa: E402
+from model_usage import JsonStream  # noqa: E402
+
+CHUNK_SIZES = [1, 2, 3, 5, 7, 64]
+
+DOCUMENTS = [
+    "0",
+    "12345678901234567890",
+    "-1.25e-10",
+    "3.14159265358979",
+    '"plain"',
+    '"esc\\"aped \\\\ \\n \\u00e9\\u20ac \\ud83d\\ude00"',
+    '"unicode é€ 😀"',
+    "true",
+    "null",
+    "[]",
+    "{}",
+    '[1, -2.5, 1e300, "a,b", [true, false, null], {"k": "v"}]',
+    '{"provider": "codex", "daily": [{"date": "2025-01-02", "totalCost": 12.345678,'
+    ' "modelBreakdowns": [{"modelName": "gpt-5", "cost": 0.0001}]}], "totals": {"totalCost": 1e-3}}',
+    ' \n\t[ 1 , { "a" : [ 2 , 3 ] } , "x" ] \n',
+]
+
+
+def walk(stream: JsonStream):
+    """Rebuild a value through items()/members(), decoding leaves with value()."""
+    char = stream.peek()
+    if char == "[":
+        result = []
+        for _ in stream.items():
+            result.append(walk(stream))
+        return result
+    if char == "{":
+        result = {}
+        for key in stream.members():
+            result[key] = walk(stream)
+        return result
+    return stream.value()
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("text", DOCUMENTS)
+def test_value_matches_json_loads(text, chunk_size):
+    stream = JsonStream(io.StringIO(text), chunk_size=chunk_size)
+    assert stream.value() == json.loads(text)
+    assert stream.peek() == ""
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("text", DOCUMENTS)
+def test_walk_matches_json_loads(text, chunk_size):
+    stream = JsonStream(io.StringIO(text), chunk_size=chunk_size)
+    assert walk(stream) == json.loads(text)
+    assert stream.peek() == ""
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3])
+def test_number_split_at_every_offset(chunk_size):
+    # Pad so the number starts at each offset within a chunk.
+    for pad in range(chunk_size + 1):
+        text = " " * pad + "[987654321.125, -42]"
+        assert JsonStream(io.StringIO(text), chunk_size=chunk_size).value() == [987654321.125, -42]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4])
+@pytest.mark.parametrize("text", ['{"a" 1}', "[1 2]", '{"a": [1, 2}', "[1, 2"])
+def test_malformed_input_raises(text, chunk_size):
+    with pytest.raises(ValueError):
+        walk(JsonStream(io.StringIO(text), chunk_size=chunk_size))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64])
+def test_stream_tables_matches_loaded_payload(chunk_size, monkeypatch):
+    payload = [
+        {
+            "provider": "codex",
+            "daily": [
+                {"date": "2025-01-01", "modelBreakdowns": [{"modelName": "gpt-5", "cost": 1.5}]},
+                {"date": "2025-01-02", "modelBreakdowns": [{"modelName": "o3", "cost": 0.25}]},
+            ],
+        },
+        {"provider": "claude", "daily": [{"date": "2025-01-02", "modelsUsed": ["claude-sonnet-4"], "totalCost": 2}]},
+    ]
+    text = json.dumps(payload)
+    original = JsonStream.__init__
+
+    def small_chunks(self, handle, chunk_size_=chunk_size):
+        original(self, handle, chunk_size_)
+
+    monkeypatch.setattr(JsonStream, "__init__", small_chunks)
+    streamed = list(model_usage.stream_tables(io.StringIO(text), None))
+    assert [name for name, _ in streamed] == ["codex", "claude"]
+    for (_, table), entry in zip(streamed, payload):
+        assert table.totals() == model_usage.build_usage_table(entry).totals()